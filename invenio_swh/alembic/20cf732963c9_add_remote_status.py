@@ -0,0 +1,36 @@
+# SPDX-FileCopyrightText: 2026 CERN.
+# SPDX-License-Identifier: MIT
+
+"""Add remote status to deposits."""
+
+import sqlalchemy as sa
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = "20cf732963c9"
+down_revision = "2c88f8bd6d8f"
+branch_labels = ()
+depends_on = None
+
+
+def upgrade():
+    """Upgrade database."""
+    op.add_column(
+        "swh_deposit", sa.Column("remote_status", sa.CHAR(length=1), nullable=True)
+    )
+    op.add_column(
+        "swh_deposit", sa.Column("remote_status_detail", sa.Text(), nullable=True)
+    )
+    op.create_index(
+        op.f("ix_swh_deposit_remote_status"),
+        "swh_deposit",
+        ["remote_status"],
+        unique=False,
+    )
+
+
+def downgrade():
+    """Downgrade database."""
+    op.drop_index(op.f("ix_swh_deposit_remote_status"), table_name="swh_deposit")
+    op.drop_column("swh_deposit", "remote_status_detail")
+    op.drop_column("swh_deposit", "remote_status")
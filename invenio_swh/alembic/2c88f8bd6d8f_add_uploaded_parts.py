@@ -0,0 +1,26 @@
+# SPDX-FileCopyrightText: 2026 CERN.
+# SPDX-License-Identifier: MIT
+
+"""Add uploaded parts to deposits."""
+
+import sqlalchemy as sa
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = "2c88f8bd6d8f"
+down_revision = "3ca42db77c30"
+branch_labels = ()
+depends_on = None
+
+
+def upgrade():
+    """Upgrade database."""
+    op.add_column(
+        "swh_deposit",
+        sa.Column("uploaded_parts", sa.Integer(), nullable=False, server_default="0"),
+    )
+
+
+def downgrade():
+    """Downgrade database."""
+    op.drop_column("swh_deposit", "uploaded_parts")
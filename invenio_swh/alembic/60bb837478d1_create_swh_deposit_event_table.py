@@ -0,0 +1,50 @@
+# SPDX-FileCopyrightText: 2026 CERN.
+# SPDX-License-Identifier: MIT
+
+"""Create swh deposit event table."""
+
+import sqlalchemy as sa
+import sqlalchemy_utils
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = "60bb837478d1"
+down_revision = "20cf732963c9"
+branch_labels = ()
+depends_on = None
+
+
+def upgrade():
+    """Upgrade database."""
+    op.create_table(
+        "swh_deposit_event",
+        sa.Column("id", sa.BigInteger(), autoincrement=True, nullable=False),
+        sa.Column("created", sa.DateTime(), nullable=False),
+        sa.Column(
+            "object_uuid", sqlalchemy_utils.types.uuid.UUIDType(), nullable=False
+        ),
+        sa.Column("status", sa.CHAR(length=1), nullable=False),
+        sa.PrimaryKeyConstraint("id", "created", name=op.f("pk_swh_deposit_event")),
+    )
+    op.create_index(
+        "ix_swh_deposit_event_created",
+        "swh_deposit_event",
+        ["created"],
+        unique=False,
+        postgresql_using="brin",
+    )
+    op.create_index(
+        op.f("ix_swh_deposit_event_object_uuid"),
+        "swh_deposit_event",
+        ["object_uuid"],
+        unique=False,
+    )
+
+
+def downgrade():
+    """Downgrade database."""
+    op.drop_index(
+        op.f("ix_swh_deposit_event_object_uuid"), table_name="swh_deposit_event"
+    )
+    op.drop_index("ix_swh_deposit_event_created", table_name="swh_deposit_event")
+    op.drop_table("swh_deposit_event")
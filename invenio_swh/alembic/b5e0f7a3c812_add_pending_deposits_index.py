@@ -0,0 +1,29 @@
+# SPDX-FileCopyrightText: 2026 CERN.
+# SPDX-License-Identifier: MIT
+
+"""Add partial index on pending deposits."""
+
+import sqlalchemy as sa
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = "b5e0f7a3c812"
+down_revision = "9d3c5e2a71b4"
+branch_labels = ()
+depends_on = None
+
+
+def upgrade():
+    """Upgrade database."""
+    op.create_index(
+        "ix_swh_deposit_pending_updated",
+        "swh_deposit",
+        ["status", "updated"],
+        unique=False,
+        postgresql_where=sa.text("status IN ('N', 'C', 'W')"),
+    )
+
+
+def downgrade():
+    """Downgrade database."""
+    op.drop_index("ix_swh_deposit_pending_updated", table_name="swh_deposit")
@@ -0,0 +1,42 @@
+# SPDX-FileCopyrightText: 2026 CERN.
+# SPDX-License-Identifier: MIT
+
+"""Create swh deposit archive table."""
+
+import sqlalchemy as sa
+import sqlalchemy_utils
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = "c7a2d94e1f36"
+down_revision = "b5e0f7a3c812"
+branch_labels = ()
+depends_on = None
+
+
+def upgrade():
+    """Upgrade database."""
+    op.create_table(
+        "swh_deposit_archive",
+        sa.Column(
+            "object_uuid", sqlalchemy_utils.types.uuid.UUIDType(), nullable=False
+        ),
+        sa.Column("swhid", sa.String(length=1024), nullable=True),
+        sa.Column("status", sa.CHAR(length=1), nullable=False),
+        sa.Column("swh_deposit_id", sa.String(), nullable=True),
+        sa.Column("collection", sa.String(length=255), nullable=True),
+        sa.Column("version_id", sa.Integer(), nullable=False),
+        sa.Column("created", sa.DateTime(), nullable=False),
+        sa.Column("updated", sa.DateTime(), nullable=False),
+        sa.Column("archived", sa.DateTime(), nullable=False),
+        sa.PrimaryKeyConstraint(
+            "object_uuid",
+            name=op.f("pk_swh_deposit_archive"),
+            postgresql_include=["swh_deposit_id", "version_id", "swhid", "status"],
+        ),
+    )
+
+
+def downgrade():
+    """Downgrade database."""
+    op.drop_table("swh_deposit_archive")
@@ -0,0 +1,26 @@
+# SPDX-FileCopyrightText: 2026 CERN.
+# SPDX-License-Identifier: MIT
+
+"""Add the SWHID referenced by metadata-only deposits."""
+
+import sqlalchemy as sa
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = "e4b1c6d93a57"
+down_revision = "c7a2d94e1f36"
+branch_labels = ()
+depends_on = None
+
+
+def upgrade():
+    """Upgrade database."""
+    op.add_column(
+        "swh_deposit",
+        sa.Column("referenced_swhid", sa.String(length=1024), nullable=True),
+    )
+
+
+def downgrade():
+    """Downgrade database."""
+    op.drop_column("swh_deposit", "referenced_swhid")
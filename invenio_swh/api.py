@@ -2,11 +2,20 @@
 # SPDX-License-Identifier: MIT
 """API representation of a Software Heritage deposit."""
 
+from datetime import datetime
+
 from invenio_db import db
 from invenio_rdm_records.proxies import current_rdm_records_service as record_service
+from sqlalchemy import case, delete, literal, or_, select, tuple_, update
 from werkzeug.utils import cached_property
 
-from invenio_swh.models import SWHDepositModel, SWHDepositStatus
+from invenio_swh.errors import DepositArchived
+from invenio_swh.models import (
+    SWHDepositArchiveModel,
+    SWHDepositModel,
+    SWHDepositStatus,
+    SWHRemoteDepositStatus,
+)
 
 
 class SWHDeposit:
@@ -24,9 +33,13 @@ class SWHDeposit:
 
     model_cls = SWHDepositModel
 
-    def __init__(self, model=None):
-        """Instantiate deposit object."""
+    def __init__(self, model=None, archived=False):
+        """Instantiate deposit object.
+
+        Archived deposits (see ``archive``) are read-only.
+        """
         self.model = model
+        self.archived = archived
 
     @classmethod
     def create(cls, object_uuid):
@@ -58,6 +71,29 @@ class SWHDeposit:
                 return self.record.parent
         return None
 
+    @cached_property
+    def previous_deposit(self):
+        """Return the last successful deposit of another version of the record, if any."""
+        records_ids = self.record_cls.get_records_by_parent(
+            self.record.parent, with_deleted=True, ids_only=True
+        )
+        records_ids = [
+            record_id
+            for record_id in records_ids
+            if str(record_id) != str(self.model.object_uuid)
+        ]
+        deposits = [
+            deposit
+            for deposit in SWHDeposit.get_by_record_ids(records_ids)
+            if deposit.status == SWHDepositStatus.SUCCESS and deposit.swhid
+        ]
+        # Archived deposits have no update date, they are older than the others
+        return max(
+            deposits,
+            key=lambda deposit: deposit.model.updated or datetime.min,
+            default=None,
+        )
+
     @property
     def record_cls(self):
         """Return the record class associated with the deposit."""
@@ -76,13 +112,150 @@ class SWHDeposit:
             deposit = query.one()
             return cls(deposit)
 
+    @classmethod
+    def get_by_ids(cls, ids):
+        """Get many swh deposits by id, in a single query.
+
+        Unknown ids are omitted.
+        """
+        if not ids:
+            return []
+        with db.session.no_autoflush:
+            query = cls.model_cls.query.filter(
+                cls.model_cls.swh_deposit_id.in_([str(id_) for id_ in ids])
+            )
+            return [cls(deposit) for deposit in query]
+
     @classmethod
     def get_by_record_id(cls, record_id):
-        """Get a local swh deposit by record id."""
+        """Get a local swh deposit by record id.
+
+        Archived deposits (see ``archive``) are returned read-only, with their ``lookup_columns`` only.
+        """
         with db.session.no_autoflush:
             deposit = cls.model_cls.query.filter_by(object_uuid=record_id).one_or_none()
+            if deposit is None:
+                return next(iter(cls._get_archived([record_id])), cls())
             return cls(deposit)
 
+    @classmethod
+    def _get_archived(cls, record_ids):
+        """Look up the archived deposits of records, only selecting the covering index columns."""
+        archive = SWHDepositArchiveModel
+        columns = [getattr(archive, name) for name in archive.lookup_columns]
+        stmt = select(*columns).where(archive.object_uuid.in_(record_ids))
+        return [
+            cls(archive.to_deposit_model(row), archived=True)
+            for row in db.session.execute(stmt)
+        ]
+
+    @classmethod
+    def get_by_record_ids(cls, record_ids):
+        """Get the local swh deposits of many records, in a single query.
+
+        Records without a deposit are omitted.
+        """
+        if not record_ids:
+            return []
+        with db.session.no_autoflush:
+            query = cls.model_cls.query.filter(
+                cls.model_cls.object_uuid.in_(record_ids)
+            )
+            deposits = [cls(deposit) for deposit in query]
+            found = {str(deposit.record_id) for deposit in deposits}
+            missing = [id_ for id_ in record_ids if str(id_) not in found]
+            if missing:
+                deposits += cls._get_archived(missing)
+            return deposits
+
+    @classmethod
+    def archive(cls, older_than, batch_size):
+        """Move a batch of deposits that reached a terminal status to the archive table.
+
+        The oldest updated "SUCCESS" and "FAILED" deposits, not updated since ``older_than``, are copied to the
+        archive table and deleted from the deposit table.
+
+        :param older_than: Only archive deposits not updated since this date.
+        :type older_than: datetime
+        :param batch_size: The maximum number of deposits to archive.
+        :type batch_size: int
+        :return: The number of archived deposits.
+        :rtype: int
+        """
+        table = cls.model_cls.__table__
+        archive = SWHDepositArchiveModel.__table__
+        query = (
+            select(table.c.object_uuid)
+            .where(
+                table.c.status.in_([SWHDepositStatus.SUCCESS, SWHDepositStatus.FAILED]),
+                table.c.updated < older_than,
+            )
+            .order_by(table.c.updated)
+            .limit(batch_size)
+        )
+        ids = [row.object_uuid for row in db.session.execute(query)]
+        if not ids:
+            return 0
+
+        columns = [
+            "object_uuid",
+            "swhid",
+            "status",
+            "swh_deposit_id",
+            "collection",
+            "version_id",
+            "created",
+            "updated",
+        ]
+        rows = select(
+            *[table.c[column] for column in columns],
+            literal(datetime.utcnow(), archive.c.archived.type),
+        ).where(table.c.object_uuid.in_(ids))
+        db.session.execute(archive.insert().from_select([*columns, "archived"], rows))
+        db.session.execute(delete(table).where(table.c.object_uuid.in_(ids)))
+
+        # Deposits loaded in the session do not exist anymore
+        for obj in list(db.session.identity_map.values()):
+            if isinstance(obj, cls.model_cls) and obj.object_uuid in ids:
+                db.session.expunge(obj)
+        return len(ids)
+
+    @property
+    def archive_size(self):
+        """Returns the size of the archive of the record."""
+        file = next(iter(self.record.files.entries.values()), None)
+        return file.file.size if file else None
+
+    @classmethod
+    def query_by_status(cls, statuses, updated_before=None):
+        """Return the query of the local swh deposits with the given statuses.
+
+        For pending statuses, the query uses the partial index on ``(status, updated)``,
+        oldest updated deposits first.
+        """
+        query = cls.model_cls.query.filter(cls.model_cls.status.in_(statuses))
+        if updated_before:
+            query = query.filter(cls.model_cls.updated < updated_before)
+        return query.order_by(cls.model_cls.updated)
+
+    @classmethod
+    def get_by_status(cls, statuses, updated_before=None):
+        """Get the local swh deposits with the given statuses, oldest updated first."""
+        for model in cls.query_by_status(statuses, updated_before=updated_before):
+            yield cls(model)
+
+    @classmethod
+    def get_by_remote_status(cls, statuses, updated_before=None):
+        """Get the local swh deposits with the given remote statuses.
+
+        The query uses the index on the remote status, oldest updated deposits first.
+        """
+        query = cls.model_cls.query.filter(cls.model_cls.remote_status.in_(statuses))
+        if updated_before:
+            query = query.filter(cls.model_cls.updated < updated_before)
+        for model in query.order_by(cls.model_cls.updated):
+            yield cls(model)
+
     @property
     def record_id(self):
         """Returns the UUID of the object associated with the record."""
@@ -108,6 +281,63 @@ class SWHDeposit:
         """Set the software hash id of the swh deposit."""
         self.model.swhid = value
 
+    @property
+    def referenced_swhid(self):
+        """Returns the software hash id referenced by a metadata-only swh deposit."""
+        return self.model.referenced_swhid if self.model else None
+
+    @referenced_swhid.setter
+    def referenced_swhid(self, value):
+        """Set the software hash id referenced by a metadata-only swh deposit."""
+        self.model.referenced_swhid = value
+
+    @property
+    def remote_status(self):
+        """Returns the last status of the deposit reported by Software Heritage."""
+        return self.model.remote_status if self.model else None
+
+    @remote_status.setter
+    def remote_status(self, value):
+        """Set the remote status of the swh deposit.
+
+        Statuses reported by Software Heritage (e.g. "loading") are converted to
+        ``SWHRemoteDepositStatus``. Unknown statuses are stored as ``None``.
+        """
+        if isinstance(value, SWHRemoteDepositStatus) or value is None:
+            self.model.remote_status = value
+        else:
+            self.model.remote_status = SWHRemoteDepositStatus.from_remote(value)
+
+    @property
+    def remote_status_detail(self):
+        """Returns the last status detail reported by Software Heritage."""
+        return self.model.remote_status_detail if self.model else None
+
+    @remote_status_detail.setter
+    def remote_status_detail(self, value):
+        """Set the remote status detail of the swh deposit."""
+        self.model.remote_status_detail = value
+
+    @property
+    def collection(self):
+        """Returns the name of the collection of the swh deposit."""
+        return self.model.collection if self.model else None
+
+    @collection.setter
+    def collection(self, value):
+        """Set the name of the collection of the swh deposit."""
+        self.model.collection = value
+
+    @property
+    def uploaded_parts(self):
+        """Returns the number of archive parts uploaded to the swh deposit."""
+        return (self.model.uploaded_parts or 0) if self.model else 0
+
+    @uploaded_parts.setter
+    def uploaded_parts(self, value):
+        """Set the number of archive parts uploaded to the swh deposit."""
+        self.model.uploaded_parts = value
+
     @property
     def status(self):
         """Returns the status of the swh deposit."""
@@ -125,10 +355,88 @@ class SWHDeposit:
                 f"Invalid status value for Software Heritage deposit. Got: {value}"
             )
 
+    @classmethod
+    def bulk_update_status(cls, status, changes):
+        """Set the status of many swh deposits in set-based statements.
+
+        Each change is only applied if the deposit is still at the version it was read at, otherwise it is skipped so
+        that concurrent updates are not overwritten. The remote status and its detail are stored even if the status is
+        unchanged, deposits with nothing to change are left untouched. The version counter of the updated deposits is
+        incremented and the deposits loaded in the session are expired.
+
+        :param status: The new status.
+        :type status: SWHDepositStatus
+        :param changes: The ``(deposit_id, version_id, remote_status, detail, swhid)`` tuples of the deposits to
+            update. The remote status, detail and SWHID can be ``None``.
+        :type changes: list
+        :return: The object UUIDs of the updated deposits, and the ones among them whose status changed.
+        :rtype: tuple
+        """
+        table = cls.model_cls.__table__
+        values = {
+            "status": status.value,
+            "version_id": table.c.version_id + 1,
+            "updated": datetime.utcnow(),
+        }
+        swhids = {id_: swhid for id_, _, _, _, swhid in changes if swhid}
+        if swhids:
+            values["swhid"] = case(
+                swhids, value=table.c.swh_deposit_id, else_=table.c.swhid
+            )
+        remote_changes = [change for change in changes if change[2]]
+        if remote_changes:
+            values["remote_status"] = case(
+                {
+                    id_: remote_status.value
+                    for id_, _, remote_status, _, _ in remote_changes
+                },
+                value=table.c.swh_deposit_id,
+                else_=table.c.remote_status,
+            )
+            values["remote_status_detail"] = case(
+                {id_: detail for id_, _, _, detail, _ in remote_changes},
+                value=table.c.swh_deposit_id,
+                else_=table.c.remote_status_detail,
+            )
+        read_versions = tuple_(table.c.swh_deposit_id, table.c.version_id).in_(
+            [(str(id_), version_id) for id_, version_id, _, _, _ in changes]
+        )
+
+        def _update(*criteria):
+            stmt = (
+                update(table)
+                .where(read_versions, *criteria)
+                .values(**values)
+                .returning(table.c.object_uuid)
+            )
+            return [row.object_uuid for row in db.session.execute(stmt)]
+
+        # Transitions are told apart from remote status updates for the deposit history
+        transitions = _update(table.c.status != status.value)
+        # Deposits already in the status are only written if their remote status, detail or SWHID changed
+        columns = ["remote_status", "remote_status_detail", "swhid"]
+        changed = [
+            values[column].is_distinct_from(table.c[column])
+            for column in columns
+            if column in values
+        ]
+        updated = list(transitions)
+        if changed:
+            updated += _update(table.c.status == status.value, or_(*changed))
+
+        # Deposits loaded in the session are stale
+        for obj in list(db.session.identity_map.values()):
+            if isinstance(obj, cls.model_cls) and obj.object_uuid in updated:
+                db.session.expire(obj)
+        return updated, transitions
+
     def commit(self):
         """Commit the deposit to the database."""
         if self.model is None:
             return
+        if self.archived:
+            # Merging the transient model would insert it back in the deposit table
+            raise DepositArchived(f"Deposit of record {self.record_id} is archived.")
 
         with db.session.begin_nested():
             res = db.session.merge(self.model)
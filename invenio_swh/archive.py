@@ -0,0 +1,278 @@
+# SPDX-FileCopyrightText: 2026 CERN.
+# SPDX-License-Identifier: MIT
+"""Archive handling for Software Heritage deposits."""
+
+import copy
+import hashlib
+import lzma
+import shutil
+import tarfile
+import tempfile
+import threading
+import zlib
+from pathlib import PurePosixPath
+from zipfile import ZIP64_LIMIT, BadZipFile, ZipFile, is_zipfile
+
+from invenio_swh.errors import InvalidArchive
+
+CHUNK_SIZE = 1024 * 1024
+
+
+def _group_members(members, part_size):
+    """Group the members of a ZIP archive in parts of at most ``part_size`` bytes.
+
+    Members bigger than ``part_size`` are sent in a part of their own.
+    """
+    groups, group, group_size = [], [], 0
+    for info in members:
+        if group and group_size + info.compress_size > part_size:
+            groups.append(group)
+            group, group_size = [], 0
+        group.append(info)
+        group_size += info.compress_size
+    if group:
+        groups.append(group)
+    return groups
+
+
+def _write_part(archive, members):
+    """Write the given members of an archive to a new, temporary, ZIP archive."""
+    part = tempfile.TemporaryFile()
+    with ZipFile(part, "w") as zpart:
+        for info in members:
+            # Copy the member info, since writing it updates its offsets
+            info = copy.copy(info)
+            if info.is_dir():
+                zpart.writestr(info, b"")
+                continue
+            force_zip64 = info.file_size >= ZIP64_LIMIT
+            with archive.open(info) as src, zpart.open(
+                info, "w", force_zip64=force_zip64
+            ) as dst:
+                shutil.copyfileobj(src, dst, CHUNK_SIZE)
+    return part
+
+
+def _part_metadata(part, metadata, index):
+    """Return the metadata of a part, computing its size and checksum."""
+    md5 = hashlib.md5()
+    part.seek(0)
+    for chunk in iter(lambda: part.read(CHUNK_SIZE), b""):
+        md5.update(chunk)
+    size = part.tell()
+    part.seek(0)
+    stem = PurePosixPath(metadata["filename"]).stem
+    return {
+        **metadata,
+        "filename": f"{stem}.part{index + 1}.zip",
+        "mimetype": "application/zip",
+        "checksum": f"md5:{md5.hexdigest()}",
+        "size": size,
+    }
+
+
+def iter_parts(fp, metadata, part_size=None, start=0):
+    """Yield the parts in which an archive is uploaded to Software Heritage.
+
+    ZIP archives bigger than ``part_size`` are split into several, smaller, ZIP archives,
+    that Software Heritage merges back when loading the deposit. Other archives are
+    uploaded as a single part.
+
+    The split is deterministic, therefore ``start`` can be used to resume an upload
+    without writing the parts that were already uploaded.
+
+    :param fp: The archive, as a seekable readable buffer.
+    :param metadata: The file metadata (i.e. filename, mimetype, checksum and size).
+    :type metadata: dict
+    :param part_size: The maximum size of a part. ``None`` disables splitting.
+    :type part_size: int
+    :param start: The index of the first part to yield.
+    :type start: int
+    :return: A generator of ``(buffer, metadata)`` tuples.
+    """
+    splittable = part_size and metadata["size"] > part_size and is_zipfile(fp)
+    fp.seek(0)
+    if not splittable:
+        if start == 0:
+            yield fp, metadata
+        return
+
+    with ZipFile(fp) as archive:
+        groups = _group_members(archive.infolist(), part_size)
+        for index, members in enumerate(groups[start:], start):
+            part = _write_part(archive, members)
+            yield part, _part_metadata(part, metadata, index)
+
+
+class _ArchiveLimits:
+    """Running count of the members and uncompressed bytes of an archive."""
+
+    def __init__(self, max_members, max_size):
+        self.max_members = max_members
+        self.max_size = max_size
+        self.members = 0
+        self.size = 0
+
+    def add_member(self):
+        self.members += 1
+        if self.max_members and self.members > self.max_members:
+            raise InvalidArchive(f"Archive has more than {self.max_members} members.")
+
+    def read(self, src):
+        """Read a member in chunks, without keeping more than a chunk in memory."""
+        size = 0
+        for chunk in iter(lambda: src.read(CHUNK_SIZE), b""):
+            size += len(chunk)
+            self.size += len(chunk)
+            if self.max_size and self.size > self.max_size:
+                raise InvalidArchive(
+                    f"Archive is bigger than {self.max_size} bytes once uncompressed."
+                )
+        return size
+
+
+def _validate_zip(fp, limits, max_ratio):
+    """Check the central directory, sizes and CRCs of the members of a ZIP archive."""
+    with ZipFile(fp) as archive:
+        for info in archive.infolist():
+            limits.add_member()
+            if info.is_dir():
+                continue
+            if max_ratio and info.file_size > max_ratio * max(info.compress_size, 1):
+                raise InvalidArchive(f"Member {info.filename} is too compressed.")
+            # The CRC is checked once the member is fully read
+            with archive.open(info) as src:
+                if limits.read(src) != info.file_size:
+                    raise InvalidArchive(f"Member {info.filename} is truncated.")
+
+
+LZMA_ALONE_MAGIC = b"\x5d\x00\x00"
+"""Start of the header of the legacy ``.lzma`` format, which ``tarfile`` does not detect."""
+
+
+def _validate_tar(fp, limits):
+    """Check the headers and the (compressed) stream of a TAR archive."""
+    if fp.read(len(LZMA_ALONE_MAGIC)) == LZMA_ALONE_MAGIC:
+        fp.seek(0)
+        fp = lzma.LZMAFile(fp, format=lzma.FORMAT_ALONE)
+    else:
+        fp.seek(0)
+    with tarfile.open(fileobj=fp, mode="r|*") as archive:
+        for info in archive:
+            limits.add_member()
+            if not info.isfile():
+                continue
+            if limits.read(archive.extractfile(info)) != info.size:
+                raise InvalidArchive(f"Member {info.name} is truncated.")
+        # Read up to the end of the compressed stream, which must be complete
+        for _ in iter(lambda: archive.fileobj.read(CHUNK_SIZE), b""):
+            pass
+        decompressor = getattr(archive.fileobj, "cmp", None)
+        if decompressor is not None and not decompressor.eof:
+            raise InvalidArchive("Archive is corrupt: truncated compressed stream")
+
+
+def validate_archive(fp, max_members=None, max_size=None, max_ratio=None):
+    """Check that an archive is readable and within the given limits.
+
+    The archive is read as a stream, one chunk at a time. ZIP archives are checked
+    against their central directory and the CRC of each member, TAR archives (possibly
+    compressed) against their headers. Archives without any member are rejected.
+
+    :param fp: The archive, as a seekable readable buffer.
+    :param max_members: The maximum number of members (files and directories).
+    :type max_members: int
+    :param max_size: The maximum total uncompressed size of the members.
+    :type max_size: int
+    :param max_ratio: The maximum compression ratio of a ZIP member.
+    :type max_ratio: int
+    :raises InvalidArchive: If the archive is corrupt, empty or exceeds a limit.
+    """
+    limits = _ArchiveLimits(max_members, max_size)
+    fp.seek(0)
+    try:
+        if is_zipfile(fp):
+            fp.seek(0)
+            _validate_zip(fp, limits, max_ratio)
+        else:
+            fp.seek(0)
+            _validate_tar(fp, limits)
+    except (
+        BadZipFile,
+        tarfile.TarError,
+        zlib.error,
+        lzma.LZMAError,
+        EOFError,
+        OSError,
+    ) as exc:
+        raise InvalidArchive(f"Archive is corrupt: {exc}") from exc
+    finally:
+        fp.seek(0)
+    if not limits.members:
+        raise InvalidArchive("Archive is empty.")
+
+
+class Prefetch:
+    """Copy a stream to a local buffer in a background thread.
+
+    The buffer is kept in memory up to ``max_memory`` bytes, and spilled to a temporary
+    file beyond, so that slow storage reads overlap with other work until ``result`` is
+    called. Closing the prefetch does not wait for the copy: it stops after the current
+    read, and the buffer is discarded then.
+    """
+
+    def __init__(self, src, max_memory=0):
+        """Start copying ``src``, which is closed once copied."""
+        self.buffer = tempfile.SpooledTemporaryFile(max_size=max_memory or 0)
+        self._error = None
+        self._closed = self._done = False
+        self._lock = threading.Lock()
+        self._thread = threading.Thread(target=self._copy, args=(src,), daemon=True)
+        self._thread.start()
+
+    def _copy(self, src):
+        try:
+            with src:
+                while not self._closed:
+                    chunk = src.read(CHUNK_SIZE)
+                    if not chunk:
+                        break
+                    with self._lock:
+                        if not self._closed:
+                            self.buffer.write(chunk)
+        except Exception as exc:
+            self._error = exc
+        finally:
+            with self._lock:
+                self._done = True
+                if self._closed:
+                    self.buffer.close()
+
+    def result(self, timeout=None):
+        """Wait for the copy and return the buffer, rewound.
+
+        :raises TimeoutError: If the copy is not done after ``timeout`` seconds.
+        :raises OSError: If the stream could not be read.
+        """
+        self._thread.join(timeout)
+        if self._thread.is_alive():
+            raise TimeoutError("Archive prefetch did not finish in time.")
+        if self._error:
+            raise self._error
+        self.buffer.seek(0)
+        return self.buffer
+
+    def close(self):
+        """Discard the buffer, without waiting for the copy (e.g. a hung storage read)."""
+        with self._lock:
+            self._closed = True
+            if self._done:
+                self.buffer.close()
+
+    def __enter__(self):
+        """Return the prefetch."""
+        return self
+
+    def __exit__(self, *exc):
+        """Discard the buffer."""
+        self.close()
@@ -3,13 +3,21 @@
 """Client integration with SWH."""
 
 import json
+import mmap
+import os
+import stat
+import time
 import urllib
+from contextlib import contextmanager
 
 import xmltodict
+from flask import current_app
+from invenio_cache import current_cache
 from lxml import etree
 
 from invenio_swh.errors import ClientException
 from invenio_swh.serializer import SoftwareHeritageXMLSerializer
+from invenio_swh.tracing import span, traced
 
 
 class SWHCLient(object):
@@ -17,6 +25,9 @@ class SWHCLient(object):
 
     serializer = SoftwareHeritageXMLSerializer
 
+    status_cache_timeout = 24 * 60 * 60
+    """Number of seconds the last status of a deposit (and its validators) is kept."""
+
     def __init__(self, client, collection_iri, serializer_cls=None):
         """Initialize the SWH client."""
         self.client = client
@@ -63,32 +74,42 @@ class SWHCLient(object):
         suffix = "status"
         return urllib.parse.urljoin(self.collection_iri, f"{deposit_id}/{suffix}/")
 
-    def create_deposit(self, codemeta_json: dict):
+    @traced("client.create_deposit")
+    def create_deposit(self, codemeta_json: dict, in_progress=True):
         """Create a deposit in SWH.
 
-        The codemeta metadata is transformed to XML and then sent to SWH.
+        The codemeta metadata is transformed to XML and then sent to SWH. Deposits created
+        without ``in_progress`` are complete (e.g. metadata-only deposits).
         """
         headers = {}
         headers["Content-Type"] = "application/atom+xml;type=entry"
-        headers["In-Progress"] = "true"
+        headers["In-Progress"] = "true" if in_progress else "false"
         swh_compatible_data = self._cleanup_data(
             codemeta_json, [("@type", "type"), ("@id", "id")]
         )
-        data = self.serializer.format_serializer.serialize_object(
-            {"atom:entry": swh_compatible_data}
-        )
+        with span("serializer.serialize_object"):
+            data = self.serializer.format_serializer.serialize_object(
+                {"atom:entry": swh_compatible_data}
+            )
         headers["Content-Length"] = str(len(data))
         resp, content = self.client.h.request(
             self.collection_iri, "POST", headers=headers, payload=data
         )
         if resp.status >= 300:
-            raise ClientException(f"Failed to create deposit: {resp.status}")
+            raise ClientException(
+                f"Failed to create deposit: {resp.status}", status=resp.status
+            )
         return self._parse_response(content)
 
-    def update_deposit_files(self, deposit_id, file, file_metadata: dict) -> None:
+    @traced("client.update_deposit_files")
+    def update_deposit_files(
+        self, deposit_id, file, file_metadata: dict, replace=True
+    ) -> None:
         """Update the files of a deposit in SWH.
 
-        File must be a readable buffer.
+        File must be a readable buffer. If ``replace`` is set, the file replaces the
+        archives previously sent to the deposit, otherwise it is added to them (e.g. to
+        upload an archive in several parts).
         """
         headers = {}
         headers["Content-Type"] = str(file_metadata.get("mimetype"))
@@ -98,19 +119,47 @@ class SWHCLient(object):
         headers["Content-Disposition"] = f"attachment; filename={fname}"
         headers["In-Progress"] = "true"
         headers["Packaging"] = "http://purl.org/net/sword/package/SimpleZip"
-        resp, content = self.client.h.request(
-            self.edit_media_iri(deposit_id),
-            "PUT",
-            headers=headers,
-            payload=file.read(),
-        )
+        with self._open_payload(file) as payload:
+            resp, content = self.client.h.request(
+                self.edit_media_iri(deposit_id),
+                "PUT" if replace else "POST",
+                headers=headers,
+                payload=payload,
+            )
         file.close()
         if resp.status >= 300:
             raise ClientException(
-                f"Failed to update deposit files {deposit_id}: {resp.status}"
+                f"Failed to update deposit files {deposit_id}: {resp.status}",
+                status=resp.status,
             )
         return self._parse_response(content)
 
+    @contextmanager
+    def _open_payload(self, file):
+        """Open the payload of a file upload.
+
+        Files backed by a regular file on the local filesystem are memory-mapped, so that
+        the archive is sent from the page cache instead of being copied into memory.
+        Other buffers (e.g. remote storage) are read.
+        """
+        try:
+            fileno = file.fileno()
+            fstat = os.fstat(fileno)
+            mappable = stat.S_ISREG(fstat.st_mode) and fstat.st_size > 0
+        except (AttributeError, OSError, ValueError):
+            mappable = False
+
+        if not mappable:
+            yield file.read()
+            return
+
+        # A memoryview is sent as a single buffer and, unlike a file, can be re-sent
+        # (e.g. when the request is retried with authentication).
+        with mmap.mmap(fileno, 0, access=mmap.ACCESS_READ) as mapped:
+            with memoryview(mapped) as view:
+                yield view
+
+    @traced("client.complete_deposit")
     def complete_deposit(self, deposit_id: int) -> dict:
         """Completes a deposit in SWH."""
         headers = {}
@@ -120,16 +169,70 @@ class SWHCLient(object):
         resp, content = self.client.h.request(
             self.se_iri(deposit_id), "POST", headers=headers
         )
+        self.clear_deposit_status(deposit_id)
         if resp.status >= 300:
             raise ClientException(
-                f"Failed to complete deposit {deposit_id}: {resp.status}"
+                f"Failed to complete deposit {deposit_id}: {resp.status}",
+                status=resp.status,
             )
         return self._parse_response(content)
 
+    def _status_cache_key(self, deposit_id):
+        """Return the cache key of the status of a deposit."""
+        return f"invenio-swh:status:{self.collection_iri}:{deposit_id}"
+
+    def clear_deposit_status(self, deposit_id):
+        """Clear the cached status of a deposit (e.g. when it is expected to change)."""
+        current_cache.delete(self._status_cache_key(deposit_id))
+
+    @traced("client.get_deposit_status")
     def get_deposit_status(self, deposit_id: int) -> dict:
-        """Return the status of a deposit."""
-        resp, content = self.client.h.request(self.status_iri(deposit_id), "GET")
-        return self._parse_response(content)
+        """Return the status of a deposit.
+
+        The last status of each deposit is cached, along with its validators (``ETag`` and
+        ``Last-Modified`` headers). During ``SWH_STATUS_CACHE_TTL`` seconds the cached status
+        is returned without a request. Afterwards, a conditional request is sent and the
+        cached status is reused, without parsing, if the remote reports it unchanged.
+        """
+        key = self._status_cache_key(deposit_id)
+        cached = current_cache.get(key)
+        if cached and cached["fresh_until"] > time.time():
+            return cached["result"]
+
+        headers = {}
+        if cached and cached["etag"]:
+            headers["If-None-Match"] = cached["etag"]
+        if cached and cached["last_modified"]:
+            headers["If-Modified-Since"] = cached["last_modified"]
+        resp, content = self.client.h.request(
+            self.status_iri(deposit_id), "GET", headers=headers
+        )
+
+        etag = resp.get("etag")
+        if cached and (
+            resp.status == 304
+            or (resp.status < 300 and etag and etag == cached["etag"])
+        ):
+            result = cached["result"]
+        elif resp.status >= 300:
+            raise ClientException(
+                f"Failed to fetch deposit status {deposit_id}: {resp.status}",
+                status=resp.status,
+            )
+        else:
+            result = self._parse_response(content)
+
+        current_cache.set(
+            key,
+            {
+                "etag": etag,
+                "last_modified": resp.get("last-modified"),
+                "fresh_until": time.time() + current_app.config["SWH_STATUS_CACHE_TTL"],
+                "result": result,
+            },
+            timeout=self.status_cache_timeout,
+        )
+        return result
 
     def _parse_response(self, response_obj: bytes) -> dict:
         """Parse the response from SWH and returns a dict."""
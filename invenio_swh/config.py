@@ -4,6 +4,7 @@
 
 """Support for onward deposit of software artifacts to Software Heritage."""
 
+from datetime import timedelta
 
 SWH_ENABLED = False
 """Enable/disable the extension."""
@@ -29,8 +30,216 @@ SWH_ACCEPTED_EXTENSIONS = {"zip", "tar", "tar.gz", "tar.bz2", "tar.lzma"}
 SWH_ACCEPTED_RECORD_TYPES = {"software"}
 """Accepted record types to deposit in Software Heritage."""
 
-SWH_RATE_LIMIT = "20/m"
-"""Rate limit for the Software Heritage API."""
+SWH_RATE_LIMIT = None
+"""Rate limit for the Software Heritage API, e.g. ``"20/m"``. ``None`` disables it.
+
+The limit is shared by all the requests to the default collection (creations, upload
+parts, completions and status polls), the ones over the limit are deferred.
+"""
 
 SWH_MAX_FILE_SIZE = 100 * 1024 * 1024
 """Maximum file size to deposit in Software Heritage."""
+
+SWH_VALIDATE_ARCHIVES = True
+"""Enable/disable the validation of archives before their deposit is created.
+
+Archives are read from storage and checked for corruption, emptiness and the limits below.
+The validated copy is only kept if the spool is enabled (see ``SWH_SPOOL_DIR``),
+otherwise the upload reads the archive from storage a second time.
+"""
+
+SWH_VALIDATION_MAX_MEMBERS = 100000
+"""Maximum number of files and directories of an archive. ``None`` disables the limit."""
+
+SWH_VALIDATION_MAX_SIZE = 10 * SWH_MAX_FILE_SIZE
+"""Maximum uncompressed size of an archive. ``None`` disables the limit."""
+
+SWH_VALIDATION_MAX_RATIO = 100
+"""Maximum compression ratio of a ZIP archive member. ``None`` disables the limit."""
+
+SWH_PREFETCH_MEMORY = 10 * 1024 * 1024
+"""Maximum size of an archive prefetched in memory, bigger ones are spilled to disk.
+
+When a deposit is created, its archive is read from storage in the background, while the
+deposit is prepared (to be validated, see ``SWH_VALIDATE_ARCHIVES``) or created in Software
+Heritage (to be spooled, see ``SWH_SPOOL_DIR``).
+"""
+
+SWH_PREFETCH_TIMEOUT = 10 * 60
+"""Maximum number of seconds to wait for the prefetch of an archive.
+
+Archives to validate that are not read in time fail the creation of the deposit, which is
+retried. Otherwise, the upload reads the archive from storage itself.
+"""
+
+SWH_SPOOL_DIR = None
+"""Local directory where the archives being deposited are cached, ``None`` disables it.
+
+Archives are copied from storage once, when they are validated or first uploaded, so that
+retried and resumed uploads read them from the local disk instead of the storage.
+"""
+
+SWH_SPOOL_MAX_SIZE = 10 * 1024 * 1024 * 1024
+"""Maximum total size of the spool, the least recently used archives are evicted beyond."""
+
+SWH_TASK_QUEUES = {
+    "create": None,
+    "upload": None,
+    "upload_large": None,
+    "complete": None,
+    "poll": None,
+}
+"""Celery queues used by each stage of the deposit workflow.
+
+Each stage (create, upload, complete and poll) is dispatched as a separate task, so that
+stages can be routed to dedicated queues and consumed by separately scaled workers, e.g.
+``celery worker -Q swh-upload --concurrency 2``. The concurrency of a stage is thus set by
+the workers consuming its queue. ``None`` routes the stage to the default queue.
+
+Archives bigger than ``SWH_SMALL_ARCHIVE_SIZE`` are uploaded through the "upload_large"
+lane. If it is ``None``, they share the "upload" queue and are only ordered by priority.
+"""
+
+SWH_SMALL_ARCHIVE_SIZE = 10 * 1024 * 1024
+"""Maximum size of an archive to be scheduled in the small lane."""
+
+SWH_TASK_PRIORITY_RANGE = (9, 0)
+"""Celery priorities given to the cheapest and the most expensive deposits, respectively.
+
+The default matches brokers where higher numbers run first (e.g. RabbitMQ). For Redis,
+where lower numbers run first, use ``(0, 9)``. ``None`` disables priorities.
+"""
+
+SWH_SCHEDULER_AGING_RATE = 1024 * 1024 / 60
+"""Estimated cost (in bytes) discounted per second a deposit has been pending.
+
+Ageing prevents large deposits from being starved by a steady flow of small ones. The
+default, 1 MiB per minute, lets a 100 MiB archive catch up with small ones after about
+an hour and a half in the queue.
+"""
+
+SWH_UPLOAD_PART_SIZE = None
+"""Maximum size of each part in which ZIP archives are uploaded.
+
+Bigger archives are split into several ZIP archives, uploaded one after the other to the
+same deposit. Completed parts are recorded on the deposit, so an interrupted upload
+resumes from the last uploaded part. ``None`` uploads archives in a single request.
+"""
+
+SWH_UPLOAD_MAX_RETRIES = 5
+"""Maximum number of attempts to resume an interrupted upload."""
+
+SWH_UPLOAD_RETRY_DELAY = 60
+"""Delay, in seconds, before resuming an interrupted upload."""
+
+SWH_CIRCUIT_BREAKER_THRESHOLD = 5
+"""Number of consecutive failed requests to Software Heritage that opens the circuit.
+
+While the circuit is open, tasks are deferred instead of sending requests to Software
+Heritage. The state is shared by all processes through the cache. ``0`` disables it.
+"""
+
+SWH_CIRCUIT_BREAKER_TIMEOUT = 300
+"""Number of seconds the circuit stays open before a probe request is sent."""
+
+SWH_STATUS_CACHE_TTL = 30
+"""Number of seconds the status of a deposit is reused without querying Software Heritage.
+
+Afterwards, the status is fetched with a conditional request where the server supports it.
+"""
+
+SWH_POLL_MIN_INTERVAL = 60
+"""Minimum number of seconds between two polls of the status of a deposit."""
+
+SWH_POLL_MAX_INTERVAL = 600
+"""Maximum number of seconds between two polls of the status of a deposit."""
+
+SWH_POLL_MAX_WAIT = 60 * 60
+"""Number of seconds after which a deposit stops being polled.
+
+Deposits still waiting are then synchronised by the ``cleanup_depositions`` task.
+"""
+
+SWH_POLL_SMOOTHING = 0.2
+"""Weight of the latest deposit in the learned time to completion of deposits."""
+
+SWH_POLL_BATCH_SIZE = 100
+"""Maximum number of deposits polled by a single ``poll_deposits`` task."""
+
+SWH_POLL_BATCH_WINDOW = 30
+"""Window, in seconds, in which deposits due at close times are polled together.
+
+Deposits still waiting are re-scheduled in batches, each polled by a single
+``poll_deposits`` task. Must be lower than ``SWH_POLL_MIN_INTERVAL``.
+"""
+
+SWH_STATUS_MAX_AGE = 60
+"""Number of seconds clients may cache the deposit statuses served by the REST API."""
+
+SWH_STATUS_MAX_RECORDS = 100
+"""Maximum number of records whose deposit status can be requested at once."""
+
+SWH_STATUS_SUCCESS_MAX_AGE = 24 * 60 * 60
+"""Number of seconds clients may cache the status of a successful deposit.
+
+Successful deposits do not change anymore, so they can be cached much longer.
+"""
+
+SWH_CREATE_LOCK_TIMEOUT = 5 * 60
+"""Number of seconds after which the lock on the deposit creation of a record expires."""
+
+SWH_METADATA_ONLY_DEPOSITS = True
+"""Enable/disable metadata-only deposits for new versions with an unchanged archive.
+
+When the archive of a new version has the same checksum as the archive of a previous,
+successfully deposited, version, only the metadata is deposited, referencing the SWHID
+of the previous deposit.
+"""
+
+SWH_COLLECTIONS = {}
+"""Additional Software Heritage collections, by name.
+
+Each collection has its own credentials, connection, circuit breaker and request budget
+(``rate_limit``, in the format of ``SWH_RATE_LIMIT``), e.g.:
+
+.. code-block:: python
+
+    SWH_COLLECTIONS = {
+        "physics": {
+            "collection_iri": "https://deposit.staging.swh.network/1/physics/",
+            "username": "physics",
+            "password": "secret",
+            "rate_limit": "60/m",
+        },
+    }
+
+The service document defaults to ``SWH_SERVICE_DOCUMENT``.
+"""
+
+SWH_COLLECTION_ROUTES = {}
+"""Collection of the deposit of a record, by community id or resource type id.
+
+Records not matching any route are deposited in the default collection.
+"""
+
+SWH_TRACING_ENABLED = False
+"""Enable/disable the tracing of the deposit pipeline (see ``invenio_swh.tracing``)."""
+
+SWH_TRACING_SAMPLE_RATE = 0.01
+"""Fraction of the traces that are recorded, so that tracing can stay on in production."""
+
+SWH_TRACING_HOOKS = []
+"""Callables (or import strings) called with each finished span.
+
+They receive the name, the duration (in seconds), the attributes and the exception of the
+span, e.g. ``"invenio_swh.tracing:log_span"`` to log them.
+"""
+
+SWH_ARCHIVE_AFTER = timedelta(days=365)
+"""Age after which "SUCCESS" and "FAILED" deposits are moved to the archive table.
+
+See the ``archive_deposits`` task. ``None`` disables the archiving.
+"""
+
+SWH_ARCHIVE_BATCH_SIZE = 1000
+"""Number of deposits archived per transaction."""
@@ -2,6 +2,8 @@
 # SPDX-License-Identifier: MIT
 """Controller module for Software Heritage remote integration."""
 
+from .breaker import CircuitBreaker
+from .budget import RateBudget
 from .controller import SWHController
 
-__all__ = ("SWHController",)
+__all__ = ("CircuitBreaker", "RateBudget", "SWHController")
@@ -0,0 +1,111 @@
+# SPDX-FileCopyrightText: 2026 CERN.
+# SPDX-License-Identifier: MIT
+"""Circuit breaker for requests to Software Heritage."""
+
+import time
+
+from flask import current_app
+from invenio_cache import current_cache
+
+from invenio_swh.errors import CircuitOpen, ClientException
+
+
+class CircuitBreaker:
+    """Circuit breaker shared by all processes, with its state stored in the cache.
+
+    The circuit opens after ``SWH_CIRCUIT_BREAKER_THRESHOLD`` consecutive failed requests.
+    While open, requests are rejected with ``CircuitOpen`` without reaching the remote.
+    Once ``SWH_CIRCUIT_BREAKER_TIMEOUT`` seconds have passed, the circuit is half-open: a
+    single probe request is let through, which closes the circuit if it succeeds or opens
+    it again if it fails.
+    """
+
+    def __init__(self, name="default"):
+        """Instantiate the circuit breaker."""
+        self.name = name
+
+    def _key(self, suffix):
+        return f"invenio-swh:breaker:{self.name}:{suffix}"
+
+    @property
+    def threshold(self):
+        """Number of consecutive failures that opens the circuit."""
+        return current_app.config["SWH_CIRCUIT_BREAKER_THRESHOLD"]
+
+    @property
+    def timeout(self):
+        """Number of seconds the circuit stays open before being probed."""
+        return current_app.config["SWH_CIRCUIT_BREAKER_TIMEOUT"]
+
+    def _retry_after(self, opened_at):
+        if opened_at is None:
+            return 0
+        return max(int(opened_at + self.timeout - time.time()), 0)
+
+    def retry_after(self):
+        """Return the number of seconds until the circuit is half-open, if open."""
+        return self._retry_after(current_cache.get(self._key("opened")))
+
+    def is_open(self):
+        """Return whether requests are currently rejected."""
+        return bool(self.threshold) and self.retry_after() > 0
+
+    def before_request(self):
+        """Check whether a request can be sent, otherwise raise ``CircuitOpen``.
+
+        Return whether failures are recorded, i.e. whether a success has to close the
+        circuit (see ``on_success``).
+        """
+        failures, opened_at = current_cache.get_many(
+            self._key("failures"), self._key("opened")
+        )
+        if not self.threshold or opened_at is None:
+            return bool(failures)
+        retry_after = self._retry_after(opened_at)
+        if retry_after > 0:
+            raise CircuitOpen("Software Heritage is unavailable.", retry_after)
+        # Half-open, only one process probes the remote
+        if not current_cache.add(self._key("probe"), 1, timeout=self.timeout):
+            raise CircuitOpen("Software Heritage is being probed.", self.timeout)
+        return True
+
+    def on_success(self):
+        """Close the circuit."""
+        current_cache.delete_many(
+            self._key("failures"), self._key("opened"), self._key("probe")
+        )
+
+    def on_failure(self):
+        """Record a failed request, opening the circuit if needed."""
+        if not self.threshold:
+            return
+        failures = current_cache.cache.inc(self._key("failures")) or 0
+        if failures >= self.threshold:
+            current_cache.set(self._key("opened"), time.time(), timeout=0)
+            current_cache.delete(self._key("probe"))
+            current_app.logger.warning(
+                f"Opening circuit to Software Heritage after {failures} failures."
+            )
+
+    def call(self, func, *args, **kwargs):
+        """Call ``func`` through the circuit breaker.
+
+        Network errors, server errors and rate limiting count as failures, while client
+        errors (e.g. an invalid deposit) do not.
+        """
+        # The circuit is only closed if needed, sparing a cache request per success
+        dirty = self.before_request()
+        try:
+            res = func(*args, **kwargs)
+        except ClientException as exc:
+            if exc.is_transient:
+                self.on_failure()
+            elif dirty:
+                self.on_success()
+            raise
+        except Exception:
+            self.on_failure()
+            raise
+        if dirty:
+            self.on_success()
+        return res
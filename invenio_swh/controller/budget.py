@@ -0,0 +1,58 @@
+# SPDX-FileCopyrightText: 2026 CERN.
+# SPDX-License-Identifier: MIT
+"""Request budget of a Software Heritage collection."""
+
+import time
+
+from invenio_cache import current_cache
+
+from invenio_swh.errors import RateBudgetExceeded
+
+PERIODS = {"s": 1, "m": 60, "h": 60 * 60, "d": 24 * 60 * 60}
+
+
+def parse_rate_limit(value):
+    """Parse a rate limit, e.g. ``"20/m"``, into a number of requests and a period.
+
+    Plain numbers are a number of requests per minute.
+    """
+    if isinstance(value, str):
+        limit, _, unit = value.partition("/")
+        return int(limit), PERIODS[unit.strip() or "m"]
+    return int(value), PERIODS["m"]
+
+
+class RateBudget:
+    """Fixed-window request budget, shared by all processes through the cache.
+
+    At most ``limit`` requests are sent per ``period`` seconds. Further requests are
+    rejected with ``RateBudgetExceeded`` until the next window, so that the tasks of a
+    busy collection are deferred instead of using up the capacity of the others.
+    """
+
+    def __init__(self, name, limit, period=60):
+        """Instantiate the budget."""
+        self.name = name
+        self.limit = limit
+        self.period = period
+
+    @classmethod
+    def from_rate_limit(cls, name, rate_limit):
+        """Create the budget of a rate limit such as ``"20/m"`` or ``60``."""
+        limit, period = parse_rate_limit(rate_limit)
+        return cls(name, limit, period)
+
+    def acquire(self):
+        """Take a request from the budget, otherwise raise ``RateBudgetExceeded``."""
+        if not self.limit:
+            return
+        now = time.time()
+        window = int(now // self.period)
+        key = f"invenio-swh:budget:{self.name}:{window}"
+        # The counter expires with its window
+        current_cache.add(key, 0, timeout=self.period * 2)
+        if (current_cache.cache.inc(key) or 0) > self.limit:
+            retry_after = int((window + 1) * self.period - now) + 1
+            raise RateBudgetExceeded(
+                f"Request budget of collection {self.name} exceeded.", retry_after
+            )
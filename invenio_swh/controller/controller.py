@@ -3,15 +3,35 @@
 """Controller for Software Heritage integration."""
 
 from invenio_swh.client import SWHCLient
+from invenio_swh.controller.breaker import CircuitBreaker
+from invenio_swh.controller.budget import RateBudget
 from invenio_swh.errors import DeserializeException
 
 
 class SWHController:
-    """Software Heritage controller."""
+    """Software Heritage controller.
 
-    def __init__(self, client: SWHCLient) -> None:
+    Requests to the remote go through a circuit breaker, which suspends them while
+    Software Heritage is unavailable (see ``CircuitBreaker``), and an optional request
+    budget (see ``RateBudget``).
+    """
+
+    def __init__(
+        self,
+        client: SWHCLient,
+        breaker: CircuitBreaker = None,
+        budget: RateBudget = None,
+    ) -> None:
         """Insantiate controller object."""
         self.client = client
+        self.breaker = breaker or CircuitBreaker()
+        self.budget = budget
+
+    def _call(self, func, *args, **kwargs):
+        """Send a request through the request budget and the circuit breaker."""
+        if self.budget:
+            self.budget.acquire()
+        return self.breaker.call(func, *args, **kwargs)
 
     def _parse_response(self, data: dict) -> dict:
         if not data:
@@ -23,6 +43,7 @@ class SWHController:
         res = {
             "deposit_id": dpid,
             "deposit_status": data.get("deposit_status"),
+            "deposit_status_detail": data.get("deposit_status_detail"),
             "deposit_swhid": data.get("deposit_swh_id_context"),
             "response": data,
         }
@@ -30,20 +51,28 @@ class SWHController:
 
     def fetch_deposit_status(self, deposit_id: int) -> dict:
         """Fetch the status of a deposit."""
-        res = self.client.get_deposit_status(deposit_id)
+        res = self._call(self.client.get_deposit_status, deposit_id)
         return self._parse_response(res)
 
-    def create_deposit(self, metadata: dict) -> dict:
+    def create_deposit(self, metadata: dict, in_progress: bool = True) -> dict:
         """Create a deposit."""
-        res = self.client.create_deposit(metadata)
+        res = self._call(self.client.create_deposit, metadata, in_progress=in_progress)
         return self._parse_response(res)
 
     def complete_deposit(self, deposit_id: int) -> dict:
         """Complete a deposit."""
-        res = self.client.complete_deposit(deposit_id)
+        res = self._call(self.client.complete_deposit, deposit_id)
         return self._parse_response(res)
 
-    def update_deposit_files(self, deposit_id: int, files, files_metadata) -> dict:
+    def update_deposit_files(
+        self, deposit_id: int, files, files_metadata, replace=True
+    ) -> dict:
         """Update a deposit's files."""
-        res = self.client.update_deposit_files(deposit_id, files, files_metadata)
+        res = self._call(
+            self.client.update_deposit_files,
+            deposit_id,
+            files,
+            files_metadata,
+            replace=replace,
+        )
         return self._parse_response(res)
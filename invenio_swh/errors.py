@@ -14,9 +14,23 @@ class InvalidRecord(InvenioSWHException):
     """
 
 
+class InvalidArchive(InvalidRecord):
+    """Raised when the archive of a record is corrupt, empty or exceeds a limit."""
+
+
 class ClientException(Exception):
     """Generic implementation of a client exception (e.g. request failed on remote)."""
 
+    def __init__(self, message, status=None):
+        """Initialise the exception with the HTTP status of the remote response."""
+        super().__init__(message)
+        self.status = status
+
+    @property
+    def is_transient(self):
+        """Whether the request can be retried (e.g. server error or rate limit)."""
+        return self.status is None or self.status >= 500 or self.status == 429
+
 
 class DepositWaiting(InvenioSWHException):
     """Raised when the deposit status is "waiting"."""
@@ -35,6 +49,23 @@ class DepositNotFound(InvenioSWHException):
 class DepositPollFailed(InvenioSWHException):
     """Raised when the deposit polling failed."""
 
+
+class DepositUploadIncomplete(InvenioSWHException):
+    """Raised when the upload of files was interrupted and can be resumed."""
+
+
+class DepositLocked(InvenioSWHException):
+    """Raised when the deposit of a record is being created by another process."""
+
+
+class DepositAlreadyCreated(InvenioSWHException):
+    """Raised when the deposit of a record was already created in Software Heritage."""
+
+
+class DepositArchived(InvenioSWHException):
+    """Raised when an archived deposit, which is read-only, is modified."""
+
+
 ####
 # Controller exceptions
 ####
@@ -44,3 +75,16 @@ class ControllerException(InvenioSWHException):
 
 class DeserializeException(ControllerException):
     """Raised when a remote response failed to be deserialized."""
+
+
+class CircuitOpen(ControllerException):
+    """Raised when requests to Software Heritage are suspended by the circuit breaker."""
+
+    def __init__(self, message, retry_after):
+        """Initialise the exception with the number of seconds to wait before retrying."""
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class RateBudgetExceeded(CircuitOpen):
+    """Raised when the request budget of a Software Heritage collection is used up."""
@@ -0,0 +1,79 @@
+# SPDX-FileCopyrightText: 2026 CERN.
+# SPDX-License-Identifier: MIT
+"""Status transition history of Software Heritage deposits."""
+
+import math
+from collections import defaultdict
+from datetime import datetime
+
+from invenio_db import db
+from invenio_records_resources.services.uow import Operation
+
+from invenio_swh.models import SWHDepositEventModel
+
+
+class DepositEventOp(Operation):
+    """Record status transitions of deposits in the deposit history.
+
+    The events are added to the session when the operation is registered, so that they
+    are committed in the same transaction as the deposits.
+    """
+
+    def __init__(self, events):
+        """Initialise the operation.
+
+        :param events: The ``(object_uuid, status)`` transitions to record.
+        :type events: list
+        """
+        self.events = events
+
+    def on_register(self, uow):
+        """Add the events to the session."""
+        created = datetime.utcnow()
+        db.session.add_all(
+            SWHDepositEventModel(
+                object_uuid=object_uuid, status=status, created=created
+            )
+            for object_uuid, status in self.events
+        )
+
+
+def percentile(values, pct):
+    """Return the percentile of sorted values, using the nearest-rank method."""
+    rank = max(math.ceil(pct / 100 * len(values)), 1)
+    return values[rank - 1]
+
+
+def stage_latencies(since=None, percentiles=(50, 90, 99)):
+    """Compute the latency percentiles of the deposit status transitions.
+
+    :param since: Only consider events created after this date.
+    :type since: datetime
+    :param percentiles: The percentiles to compute.
+    :type percentiles: tuple
+    :return: The count and percentiles (in seconds) per transition, e.g.
+        ``{"CREATED->WAITING": {"count": 10, "p50": 3.2, ...}}``.
+    :rtype: dict
+    """
+    model = SWHDepositEventModel
+    query = db.session.query(model.object_uuid, model.status, model.created)
+    if since:
+        query = query.filter(model.created >= since)
+    query = query.order_by(model.object_uuid, model.created, model.id)
+
+    durations = defaultdict(list)
+    previous = None
+    for event in query.yield_per(1000):
+        if previous and previous.object_uuid == event.object_uuid:
+            transition = f"{previous.status.name}->{event.status.name}"
+            delta = (event.created - previous.created).total_seconds()
+            durations[transition].append(delta)
+        previous = event
+
+    res = {}
+    for transition, values in durations.items():
+        values.sort()
+        res[transition] = {"count": len(values)}
+        for pct in percentiles:
+            res[transition][f"p{pct}"] = percentile(values, pct)
+    return res
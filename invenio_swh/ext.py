@@ -4,29 +4,21 @@
 
 """Support for onward deposit of software artifacts to Software Heritage."""
 
-import sword2
-from flask.blueprints import Blueprint
+from flask import current_app
 from invenio_rdm_records.services.signals import post_publish_signal
 
-from invenio_swh.client import SWHCLient
-from invenio_swh.controller import SWHController
-from invenio_swh.service import SWHService
 from invenio_swh.signals import post_publish_receiver
+from invenio_swh.views import blueprint
 
 from . import config
 
-blueprint = Blueprint(
-    "invenio_swh",
-    __name__,
-    template_folder="templates",
-)
-
 
 class InvenioSWH(object):
     """invenio-swh extension."""
 
     def __init__(self, app=None):
         """Extension initialization."""
+        self._service = None
         if app:
             self.init_app(app)
 
@@ -38,23 +30,64 @@ class InvenioSWH(object):
         self.init_config(app)
         if self.is_enabled(app) and self.is_configured(app):
             self.init_signals()
-            self.init_service(app)
             app.extensions["invenio-swh"] = self
             app.register_blueprint(blueprint)
 
+    @property
+    def service(self):
+        """The SWH service, initialized on first use."""
+        if self._service is None:
+            self.init_service(current_app)
+        return self._service
+
     def init_service(self, app):
         """Initialize the service.
 
-        Both the swh controller and client are injected into the service.
+        Both the swh controller and client are injected into the service. Each collection
+        of ``SWH_COLLECTIONS`` gets its own client and controller.
+
+        The service is only needed by processes talking to Software Heritage, therefore
+        the client dependencies (e.g. ``sword2`` and ``lxml``) are imported here instead
+        of when the extension is loaded.
         """
-        sword_client = sword2.Connection(
-            service_document_iri=app.config["SWH_SERVICE_DOCUMENT"],
-            user_name=app.config["SWH_USERNAME"],
-            user_pass=app.config["SWH_PASSWORD"],
+        import sword2
+
+        from invenio_swh.client import SWHCLient
+        from invenio_swh.controller import CircuitBreaker, RateBudget, SWHController
+        from invenio_swh.service import SWHService
+
+        def create_controller(
+            name,
+            collection_iri,
+            username,
+            password,
+            service_document=None,
+            rate_limit=None,
+        ):
+            sword_client = sword2.Connection(
+                service_document_iri=service_document
+                or app.config["SWH_SERVICE_DOCUMENT"],
+                user_name=username,
+                user_pass=password,
+            )
+            client = SWHCLient(sword_client, collection_iri)
+            budget = (
+                RateBudget.from_rate_limit(name, rate_limit) if rate_limit else None
+            )
+            return SWHController(client, CircuitBreaker(name), budget)
+
+        controller = create_controller(
+            "default",
+            app.config["SWH_COLLECTION_IRI"],
+            app.config["SWH_USERNAME"],
+            app.config["SWH_PASSWORD"],
+            rate_limit=app.config["SWH_RATE_LIMIT"],
         )
-        client = SWHCLient(sword_client, app.config["SWH_COLLECTION_IRI"])
-        controller = SWHController(client)
-        self.service = SWHService(controller)
+        controllers = {
+            name: create_controller(name, **collection)
+            for name, collection in app.config["SWH_COLLECTIONS"].items()
+        }
+        self._service = SWHService(controller, controllers)
 
     def init_signals(self):
         """Initialize signals."""
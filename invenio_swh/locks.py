@@ -0,0 +1,44 @@
+# SPDX-FileCopyrightText: 2026 CERN.
+# SPDX-License-Identifier: MIT
+"""Locks on Software Heritage deposits, shared by all processes."""
+
+from flask import current_app
+from invenio_cache import current_cache
+from invenio_records_resources.services.uow import Operation
+
+
+class RecordLock:
+    """Lock on the deposit of a record, with its state stored in the cache.
+
+    The lock expires after ``SWH_CREATE_LOCK_TIMEOUT`` seconds, so that a crashed
+    process does not block the deposit of the record forever.
+    """
+
+    def __init__(self, record_id):
+        """Instantiate the lock."""
+        self.key = f"invenio-swh:lock:{record_id}"
+
+    def acquire(self):
+        """Acquire the lock, returning whether it was acquired."""
+        timeout = current_app.config["SWH_CREATE_LOCK_TIMEOUT"]
+        return bool(current_cache.add(self.key, 1, timeout=timeout))
+
+    def release(self):
+        """Release the lock."""
+        current_cache.delete(self.key)
+
+
+class ReleaseLockOp(Operation):
+    """Release a lock once the unit of work is committed or rolled back."""
+
+    def __init__(self, lock):
+        """Initialise the operation."""
+        self.lock = lock
+
+    def on_post_commit(self, uow):
+        """Release the lock."""
+        self.lock.release()
+
+    def on_post_rollback(self, uow):
+        """Release the lock."""
+        self.lock.release()
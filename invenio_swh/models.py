@@ -2,6 +2,7 @@
 # SPDX-License-Identifier: MIT
 """Databatase models for software heritage integration."""
 
+from datetime import datetime
 from enum import Enum
 
 from invenio_db import db
@@ -30,6 +31,46 @@ class SWHDepositStatus(Enum):
     """Deposit was failed to be loaded by Software Heritage."""
 
 
+class SWHRemoteDepositStatus(Enum):
+    """Constants for possible status of a deposit in Software Heritage."""
+
+    __order__ = "PARTIAL DEPOSITED VERIFIED LOADING DONE REJECTED EXPIRED FAILED"
+
+    PARTIAL = "P"
+    """Deposit is not complete, more files or metadata are expected."""
+
+    DEPOSITED = "D"
+    """Deposit is complete and waiting to be verified."""
+
+    VERIFIED = "V"
+    """Deposit was verified and is waiting to be loaded."""
+
+    LOADING = "L"
+    """Deposit is being loaded into the archive."""
+
+    DONE = "S"
+    """Deposit was loaded into the archive."""
+
+    REJECTED = "R"
+    """Deposit failed the verification."""
+
+    EXPIRED = "E"
+    """Deposit was not completed in time."""
+
+    FAILED = "F"
+    """Deposit failed to be loaded into the archive."""
+
+    @classmethod
+    def from_remote(cls, value):
+        """Return the status matching a status reported by Software Heritage, if any."""
+        return cls.__members__.get(str(value).upper()) if value else None
+
+    @property
+    def remote(self):
+        """Return the status as reported by Software Heritage."""
+        return self.name.lower()
+
+
 class SWHDepositModel(db.Model, Timestamp):
     """Model for a Software Heritage deposit."""
 
@@ -37,6 +78,16 @@ class SWHDepositModel(db.Model, Timestamp):
 
     __tablename__ = "swh_deposit"
 
+    __table_args__ = (
+        # Sweeps only look for pending deposits, which are a small fraction of the table
+        db.Index(
+            "ix_swh_deposit_pending_updated",
+            "status",
+            "updated",
+            postgresql_where=db.text("status IN ('N', 'C', 'W')"),
+        ),
+    )
+
     version_id = db.Column(db.Integer, nullable=False)
     """Used by SQLAlchemy for optimistic concurrency control."""
 
@@ -48,6 +99,9 @@ class SWHDepositModel(db.Model, Timestamp):
     swhid = db.Column(db.String(1024), nullable=True)
     """Software Hash ID."""
 
+    referenced_swhid = db.Column(db.String(1024), nullable=True)
+    """Software Hash ID referenced by a metadata-only deposit, its SWHID once it succeeds."""
+
     swh_deposit_id = db.Column(db.String, nullable=True, index=True, unique=True)
     """Software Heritage deposit id."""
 
@@ -59,6 +113,117 @@ class SWHDepositModel(db.Model, Timestamp):
     )
     """Deposit status. It is indexed to improve the search of deposits that e.g failed."""
 
+    remote_status = db.Column(
+        ChoiceType(SWHRemoteDepositStatus, impl=db.CHAR(1)),
+        nullable=True,
+        index=True,
+    )
+    """Last status reported by Software Heritage, more detailed than ``status``."""
+
+    remote_status_detail = db.Column(db.Text, nullable=True)
+    """Last status detail reported by Software Heritage (e.g. the reason of a failure)."""
+
+    collection = db.Column(db.String(255), nullable=True)
+    """Name of the Software Heritage collection of the deposit (see ``SWH_COLLECTIONS``).
+
+    Deposits without collection belong to the default collection.
+    """
+
+    uploaded_parts = db.Column(
+        db.Integer, nullable=False, default=0, server_default="0"
+    )
+    """Number of archive parts already uploaded, used to resume interrupted uploads."""
+
     def __repr__(self):
         """Return string representation of a SWHDeposit."""
         return f"<SWHDepositModel(deposit_id={self.swh_deposit_id}, object_uuid={self.object_uuid}, status={self.status})>"
+
+
+class SWHDepositEventModel(db.Model):
+    """Append-only log of the status transitions of Software Heritage deposits.
+
+    Rows are kept narrow and are only inserted. The primary key includes ``created``, so
+    that the table can be range-partitioned by month if it grows large.
+    """
+
+    __tablename__ = "swh_deposit_event"
+
+    __table_args__ = (
+        db.Index("ix_swh_deposit_event_created", "created", postgresql_using="brin"),
+    )
+
+    id = db.Column(db.BigInteger, primary_key=True, autoincrement=True)
+    """Event id."""
+
+    created = db.Column(
+        db.DateTime, primary_key=True, nullable=False, default=datetime.utcnow
+    )
+    """Date of the transition. It is indexed (BRIN) since rows are inserted in order."""
+
+    object_uuid = db.Column(UUIDType, nullable=False, index=True)
+    """Object ID of the deposit - e.g. a record id."""
+
+    status = db.Column(
+        ChoiceType(SWHDepositStatus, impl=db.CHAR(1)),
+        nullable=False,
+    )
+    """Status of the deposit after the transition."""
+
+
+class SWHDepositArchiveModel(db.Model):
+    """Cold storage of the deposits that reached a terminal status long ago.
+
+    The primary key index covers the other ``lookup_columns``, so that lookups selecting
+    only them are answered from the index alone. The other fields are kept for auditing.
+    """
+
+    __tablename__ = "swh_deposit_archive"
+
+    __table_args__ = (
+        db.PrimaryKeyConstraint(
+            "object_uuid",
+            name="pk_swh_deposit_archive",
+            postgresql_include=["swh_deposit_id", "version_id", "swhid", "status"],
+        ),
+    )
+
+    object_uuid = db.Column(UUIDType)
+    """Object ID - e.g. a record id."""
+
+    swhid = db.Column(db.String(1024), nullable=True)
+    """Software Hash ID."""
+
+    status = db.Column(ChoiceType(SWHDepositStatus, impl=db.CHAR(1)), nullable=False)
+    """Deposit status, either "SUCCESS" or "FAILED"."""
+
+    swh_deposit_id = db.Column(db.String, nullable=True)
+    """Software Heritage deposit id."""
+
+    collection = db.Column(db.String(255), nullable=True)
+    """Name of the Software Heritage collection of the deposit."""
+
+    version_id = db.Column(db.Integer, nullable=False)
+    """Version of the deposit when it was archived."""
+
+    created = db.Column(db.DateTime, nullable=False)
+    """Creation date of the deposit."""
+
+    updated = db.Column(db.DateTime, nullable=False)
+    """Last update date of the deposit."""
+
+    archived = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    """Date the deposit was archived."""
+
+    lookup_columns = (
+        "object_uuid",
+        "swh_deposit_id",
+        "version_id",
+        "swhid",
+        "status",
+    )
+    """Columns of the covering index, selected by lookups to be answered from the index."""
+
+    @staticmethod
+    def to_deposit_model(row):
+        """Return a transient deposit model from the ``lookup_columns`` of an archived deposit."""
+        return SWHDepositModel(**row._mapping)
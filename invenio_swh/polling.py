@@ -0,0 +1,79 @@
+# SPDX-FileCopyrightText: 2026 CERN.
+# SPDX-License-Identifier: MIT
+"""Adaptive polling of the status of Software Heritage deposits."""
+
+from flask import current_app
+from invenio_cache import current_cache
+
+
+class PollingPolicy:
+    """Schedule the polls of a deposit close to its expected completion.
+
+    The time a deposit takes to be loaded by Software Heritage is learned from previous
+    deposits, per archive size (in buckets of powers of two) and remote status (e.g.
+    "deposited", "verified" or "loading"). When a deposit is loaded, the time elapsed since
+    each remote status was first seen is recorded as an exponential moving average.
+
+    Deposits without history are polled with an exponential backoff.
+    """
+
+    def _key(self, bucket, status):
+        return f"invenio-swh:polling:{bucket}:{status}"
+
+    def size_bucket(self, size):
+        """Return the bucket of an archive size."""
+        return int(size or 0).bit_length()
+
+    def backoff(self, retries):
+        """Return the delay of a poll without history, doubling on each retry."""
+        min_interval = current_app.config["SWH_POLL_MIN_INTERVAL"]
+        max_interval = current_app.config["SWH_POLL_MAX_INTERVAL"]
+        return min(min_interval * 2**retries, max_interval)
+
+    def expected_remaining(self, size, status):
+        """Return the expected time to completion from the first time a status is seen."""
+        return current_cache.get(self._key(self.size_bucket(size), status))
+
+    def observe(self, size, seen, done_at):
+        """Record the time to completion of a loaded deposit.
+
+        :param size: The size of the archive.
+        :type size: int
+        :param seen: The timestamp each remote status was first seen at.
+        :type seen: dict
+        :param done_at: The timestamp the deposit was seen loaded.
+        :type done_at: float
+        """
+        smoothing = current_app.config["SWH_POLL_SMOOTHING"]
+        bucket = self.size_bucket(size)
+        for status, seen_at in seen.items():
+            sample = done_at - seen_at
+            previous = current_cache.get(self._key(bucket, status))
+            if previous is not None:
+                sample = smoothing * sample + (1 - smoothing) * previous
+            current_cache.set(self._key(bucket, status), sample, timeout=0)
+
+    def next_countdown(self, size, status, seen, now, retries=0):
+        """Return the number of seconds until the next poll of a deposit.
+
+        :param size: The size of the archive.
+        :type size: int
+        :param status: The current remote status.
+        :type status: str
+        :param seen: The timestamp each remote status was first seen at.
+        :type seen: dict
+        :param now: The current timestamp.
+        :type now: float
+        :param retries: The number of polls done.
+        :type retries: int
+        """
+        min_interval = current_app.config["SWH_POLL_MIN_INTERVAL"]
+        max_interval = current_app.config["SWH_POLL_MAX_INTERVAL"]
+        expected = self.expected_remaining(size, status) if status else None
+        if expected is None:
+            return self.backoff(retries)
+        remaining = expected - (now - seen.get(status, now))
+        if remaining <= 0:
+            # Slower than usual
+            return self.backoff(retries)
+        return int(min(max(remaining, min_interval), max_interval))
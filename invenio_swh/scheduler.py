@@ -0,0 +1,82 @@
+# SPDX-FileCopyrightText: 2026 CERN.
+# SPDX-License-Identifier: MIT
+"""Size-aware scheduling of the deposit workflow stages."""
+
+import math
+from datetime import datetime
+
+from flask import current_app
+
+MiB = 1024 * 1024
+
+
+def estimate_cost(size, retries=0, created=None):
+    """Estimate the cost of a deposit, in bytes to be transferred.
+
+    Failed attempts increase the cost, while the time the deposit has been pending
+    decreases it (see ``SWH_SCHEDULER_AGING_RATE``).
+
+    :param size: The size of the archive.
+    :type size: int
+    :param retries: The number of previous attempts.
+    :type retries: int
+    :param created: The creation date of the deposit.
+    :type created: datetime
+    :return: The estimated cost.
+    :rtype: float
+    """
+    age = (datetime.utcnow() - created).total_seconds() if created else 0
+    aging_rate = current_app.config["SWH_SCHEDULER_AGING_RATE"]
+    return max(size * (1 + retries) - age * aging_rate, 0)
+
+
+def get_priority(cost):
+    """Return the Celery priority of a deposit given its estimated cost.
+
+    Costs are mapped on a logarithmic scale (in MiB), up to ``SWH_MAX_FILE_SIZE``, so that
+    the few priority levels discriminate between small and medium archives as well.
+    """
+    priority_range = current_app.config["SWH_TASK_PRIORITY_RANGE"]
+    if not priority_range:
+        return None
+    cheapest, costliest = priority_range
+    max_cost = current_app.config["SWH_MAX_FILE_SIZE"] / MiB
+    ratio = min(math.log1p(cost / MiB) / math.log1p(max_cost), 1)
+    return round(cheapest + (costliest - cheapest) * ratio)
+
+
+def get_queue(stage, size=None):
+    """Return the queue of a workflow stage.
+
+    Archives bigger than ``SWH_SMALL_ARCHIVE_SIZE`` use the large lane of the stage, if
+    configured, so that small archives are never queued behind them.
+    """
+    queues = current_app.config["SWH_TASK_QUEUES"]
+    if size is not None and size > current_app.config["SWH_SMALL_ARCHIVE_SIZE"]:
+        return queues.get(f"{stage}_large") or queues.get(stage)
+    return queues.get(stage)
+
+
+def stage_options(stage, size=None, retries=0, created=None):
+    """Return the options used to dispatch a stage of the deposit workflow.
+
+    :param stage: The workflow stage, i.e. one of ``SWH_TASK_QUEUES``.
+    :type stage: str
+    :param size: The size of the archive, if known.
+    :type size: int
+    :param retries: The number of previous attempts.
+    :type retries: int
+    :param created: The creation date of the deposit.
+    :type created: datetime
+    :return: The keyword arguments passed to ``apply_async``.
+    :rtype: dict
+    """
+    options = {}
+    queue = get_queue(stage, size=size)
+    if queue:
+        options["queue"] = queue
+    if size is not None:
+        priority = get_priority(estimate_cost(size, retries, created))
+        if priority is not None:
+            options["priority"] = priority
+    return options
@@ -2,23 +2,42 @@
 # SPDX-License-Identifier: MIT
 """Invenio Software Heritage service."""
 
+import uuid
 from zipfile import Path, is_zipfile
 
 from flask import current_app
+from invenio_access.permissions import system_identity
+from invenio_pidstore.models import PersistentIdentifier, PIDStatus
 from invenio_rdm_records.proxies import current_rdm_records_service as record_service
 from invenio_records_resources.services.uow import RecordCommitOp, unit_of_work
+from invenio_search.engine import dsl
 from sqlalchemy.orm.exc import NoResultFound
 
 from invenio_swh.api import SWHDeposit
+from invenio_swh.archive import Prefetch, iter_parts, validate_archive
 from invenio_swh.controller import SWHController
 from invenio_swh.errors import (
+    CircuitOpen,
+    ClientException,
+    DepositAlreadyCreated,
     DepositFailed,
+    DepositLocked,
     DepositNotCreated,
     DepositNotFound,
+    DepositUploadIncomplete,
     InvalidRecord,
 )
-from invenio_swh.models import SWHDepositStatus
+from invenio_swh.events import DepositEventOp, stage_latencies
+from invenio_swh.locks import RecordLock, ReleaseLockOp
+from invenio_swh.models import SWHDepositStatus, SWHRemoteDepositStatus
 from invenio_swh.schema import SWHCodemetaSchema
+from invenio_swh.spool import ArchiveSpool
+from invenio_swh.tracing import (
+    TracedUnitOfWork,
+    span,
+    traced,
+    traced_unit_of_work,
+)
 
 
 class SWHDepositResult(object):
@@ -63,47 +82,224 @@ class SWHService(object):
         """Return a result item."""
         return self.result_cls(deposit)
 
-    def __init__(self, controller: SWHController):
+    def __init__(self, controller: SWHController, controllers: dict = None):
         """Instantiate the service.
 
-        Injects the software heritage controller into the service.
+        Injects the software heritage controller into the service. ``controllers`` are the controllers of the
+        additional collections, by name (see ``SWH_COLLECTIONS``).
         """
         self.controller = controller
+        self.controllers = controllers or {}
 
-    @unit_of_work()
+    def get_controller(self, deposit: SWHDeposit) -> SWHController:
+        """Return the controller of the collection of a deposit."""
+        return self.controllers.get(deposit.collection, self.controller)
+
+    def resolve_collection(self, record):
+        """Return the name of the collection a record is deposited to, if not the default one.
+
+        The collection is routed by community id or resource type id (see ``SWH_COLLECTION_ROUTES``).
+        """
+        routes = current_app.config["SWH_COLLECTION_ROUTES"]
+        resource_type = record.get("metadata", {}).get("resource_type", {}).get("id")
+        for key in [*record.parent.communities.ids, resource_type]:
+            if routes.get(key) in self.controllers:
+                return routes[key]
+        return None
+
+    @traced("service.create")
+    @traced_unit_of_work()
     def create(self, record, uow=None):
         """Create a new deposit.
 
-        If the controller fails to create the deposit, it won't be created locally either.
+        Creation is idempotent: the deposit is persisted locally, with status "NEW" and the record id as key, before it
+        is created in Software Heritage. If the controller fails to create the deposit, it stays "NEW" and the creation
+        can be retried. A per-record lock (see ``SWH_CREATE_LOCK_TIMEOUT``) prevents concurrent creations.
+
+        If the archive is unchanged since a previous version that was successfully deposited, a metadata-only deposit
+        referencing its SWHID is created instead. Such deposits are complete right away, without upload, and "WAITING"
+        until Software Heritage accepts them. They get the SWHID they reference (``referenced_swhid``) once "SUCCESS".
+        Otherwise, the archive is prefetched from storage in the background (see ``SWH_PREFETCH_TIMEOUT``). If archives
+        are validated (see ``SWH_VALIDATE_ARCHIVES``), the read overlaps with the preparation of the metadata, and the
+        archive is validated before the deposit is persisted. Otherwise, it overlaps with the creation of the deposit in
+        Software Heritage, and the copy is kept in the spool for the upload (see ``SWH_SPOOL_DIR``).
+
+        :raises InvalidArchive: If the archive is corrupt, empty or too big once uncompressed.
+        :raises TimeoutError: If the archive to validate could not be read in time.
+        :raises DepositLocked: If the deposit is being created by another process.
+        :raises DepositAlreadyCreated: If the deposit was already created in Software Heritage.
         """
         self.validate_record(record)
 
-        metadata = self.schema.dump(record)
-        deposit = self.record_cls.create(record.id)
+        lock = RecordLock(record.id)
+        if not lock.acquire():
+            raise DepositLocked(f"Deposit of record {record.id} is being created.")
+        uow.register(ReleaseLockOp(lock))
+
+        deposit = self.record_cls.get_by_record_id(record.id)
+        is_new = deposit.model is None
+        if is_new:
+            deposit = self.record_cls.create(record.id)
+            deposit.collection = self.resolve_collection(record)
+        elif deposit.status != SWHDepositStatus.NEW:
+            raise DepositAlreadyCreated(
+                f"Deposit of record {record.id} was already created: {deposit.id}."
+            )
 
-        # Add origin information to the deposit medatada
-        parent_doi = record.parent.pids["doi"]["identifier"]
-        origin_url = {"swh:origin": {"@url": f"https://doi.org/{parent_doi}"}}
-        metadata["swh:deposit"] = {
-            ("swh:add_to_origin" if deposit.origin else "swh:create_origin"): origin_url
-        }
+        previous = self._get_unchanged_deposit(deposit, record)
+        validate = not previous and current_app.config["SWH_VALIDATE_ARCHIVES"]
+        prefetch = None
+        if not previous and (validate or self.spool):
+            # The archive is read from storage while the deposit is prepared and, if not validated first, created
+            prefetch = self.prefetch_archive(record.files)
+        timeout = current_app.config["SWH_PREFETCH_TIMEOUT"]
+        try:
+            with span("service.schema_dump"):
+                metadata = self.schema.dump(record)
+            if validate:
+                with span("service.validate_archive"):
+                    fp = prefetch.result(timeout)
+                    self.validate_archive(fp)
+                # Keep a local copy for the upload
+                self._spool_archive(record.files, fp)
+
+            if is_new:
+                self._commit_deposit(deposit)
+            swh_deposit = self._create_remote_deposit(
+                deposit, record, metadata, previous
+            )
+
+            if prefetch and not validate:
+                try:
+                    with span("service.spool_archive"):
+                        self._spool_archive(record.files, prefetch.result(timeout))
+                except (TimeoutError, OSError):
+                    # The deposit is created, the upload reads the archive from storage instead
+                    current_app.logger.warning(
+                        "Failed to prefetch the archive.", exc_info=True
+                    )
+        finally:
+            if prefetch:
+                prefetch.close()
 
-        swh_deposit = self.controller.create_deposit(metadata)
         deposit_id = swh_deposit.get("deposit_id")
         if not deposit_id:
             raise DepositNotCreated("Deposit id not returned by SWH.")
 
         deposit.id = str(deposit_id)
-        self.update_status(deposit, SWHDepositStatus.CREATED, uow=uow)
+        if previous:
+            deposit.referenced_swhid = previous.swhid
+            # SWH can still reject the deposit, e.g. its metadata, it is confirmed by polling its status
+            self.update_status(deposit, SWHDepositStatus.WAITING, uow=uow)
+        else:
+            self.update_status(deposit, SWHDepositStatus.CREATED, uow=uow)
 
         uow.register(RecordCommitOp(deposit))
         return deposit
 
+    def _create_remote_deposit(self, deposit, record, metadata, previous=None):
+        """Create the deposit of a record in Software Heritage, referencing the previous deposit if any."""
+        controller = self.get_controller(deposit)
+        if previous:
+            # The archive is already in SWH, only the metadata of the new version is deposited
+            reference = {"swh:object": {"@swhid": previous.swhid}}
+            metadata["swh:deposit"] = {"swh:reference": reference}
+            return controller.create_deposit(metadata, in_progress=False)
+        # Add origin information to the deposit medatada
+        parent_doi = record.parent.pids["doi"]["identifier"]
+        origin_url = {"swh:origin": {"@url": f"https://doi.org/{parent_doi}"}}
+        origin_key = "swh:add_to_origin" if deposit.origin else "swh:create_origin"
+        metadata["swh:deposit"] = {origin_key: origin_url}
+        return controller.create_deposit(metadata)
+
+    def _get_unchanged_deposit(self, deposit, record):
+        """Return the successful deposit of a previous version with the same archive, if any.
+
+        Archives are compared by checksum. The fast path is disabled by ``SWH_METADATA_ONLY_DEPOSITS``.
+        """
+        if not current_app.config["SWH_METADATA_ONLY_DEPOSITS"]:
+            return None
+        previous = deposit.previous_deposit
+        if previous is None or previous.collection != deposit.collection:
+            return None
+        try:
+            checksum = self._get_first_file(record.files).file.checksum
+            previous_files = previous.record.files
+            previous_checksum = self._get_first_file(previous_files).file.checksum
+        except Exception:
+            # e.g. the previous version was deleted, deposit the archive again
+            return None
+        return previous if checksum and checksum == previous_checksum else None
+
+    def resolve_record_ids(self, pids):
+        """Resolve record PIDs (e.g. ``abcd-1234``) to the internal record ids, in a single query.
+
+        Values that are not record PIDs but internal record ids (UUIDs) are kept as they are.
+
+        :param pids: The record PIDs.
+        :type pids: Iterable[str]
+        :return: The record id of each resolved PID. Unknown PIDs are omitted.
+        :rtype: dict
+        """
+        pids = list(pids)
+        query = PersistentIdentifier.query.filter(
+            PersistentIdentifier.pid_type == "recid",
+            PersistentIdentifier.pid_value.in_(pids),
+            PersistentIdentifier.status == PIDStatus.REGISTERED,
+        )
+        record_ids = {pid.pid_value: str(pid.object_uuid) for pid in query}
+        for pid in pids:
+            if pid not in record_ids:
+                try:
+                    record_ids[pid] = str(uuid.UUID(pid))
+                except ValueError:
+                    continue
+        return record_ids
+
+    def filter_readable_records(self, identity, record_ids):
+        """Return the ids of the records that an identity can read, in a single query.
+
+        :param identity: The identity of the requester.
+        :type identity: flask_principal.Identity
+        :param record_ids: The internal record ids.
+        :type record_ids: Iterable[str]
+        :return: The ids of the readable records. Unknown and deleted records are omitted.
+        :rtype: set
+        """
+        record_ids = list(record_ids)
+        if not record_ids:
+            return set()
+        return {
+            str(record.id)
+            for record in record_service.record_cls.get_records(record_ids)
+            if not record.deletion_status.is_deleted
+            and record_service.check_permission(identity, "read", record=record)
+        }
+
     def get_record_deposit(self, record_id):
         """Return the deposit associated to a given record."""
         deposit = self.record_cls.get_by_record_id(record_id)
         return self.result_item(deposit)
 
+    def get_record_deposits(self, record_ids):
+        """Return the deposits associated to the given records, in a single query.
+
+        :param record_ids: The IDs of the records.
+        :type record_ids: Iterable[str]
+        :return: The deposits, in the order of ``record_ids``. Records without a deposit are omitted.
+        :rtype: list[SWHDepositResult]
+        """
+        record_ids = [str(record_id) for record_id in record_ids]
+        deposits = {
+            str(deposit.record_id): deposit
+            for deposit in self.record_cls.get_by_record_ids(record_ids)
+        }
+        return [
+            self.result_item(deposits[record_id])
+            for record_id in record_ids
+            if record_id in deposits
+        ]
+
     def read(self, id_) -> SWHDepositResult:
         """Read a deposit given its id."""
         try:
@@ -112,36 +308,129 @@ class SWHService(object):
             raise DepositNotFound(f"Deposit {id_} not found.")
         return self.result_item(deposit)
 
-    @unit_of_work()
+    def _get_deposit(self, id_or_deposit) -> SWHDeposit:
+        """Return a deposit given its id, or the deposit itself if already loaded."""
+        if isinstance(id_or_deposit, SWHDeposit):
+            return id_or_deposit
+        return self.read(id_or_deposit).deposit
+
+    @traced("service.sync_status")
+    @traced_unit_of_work()
     def sync_status(self, id_, uow=None):
-        """Synchronize local state with external source (SWH)."""
-        deposit_res = self.read(id_)
-        deposit = deposit_res.deposit
+        """Synchronize local state with external source (SWH).
+
+        ``id_`` can also be an already loaded deposit, to avoid reading it again.
+        """
+        deposit = self._get_deposit(id_)
         if not deposit:
             return
-        res = self.controller.fetch_deposit_status(deposit.id)
+        res = self.get_controller(deposit).fetch_deposit_status(deposit.id)
         new_status = res.get("deposit_status")
-        self.update_status(deposit, new_status)
+        self.update_remote_status(
+            deposit, new_status, res.get("deposit_status_detail"), uow=uow
+        )
+        self.update_status(deposit, new_status, uow=uow)
 
         # Handle swhid created
         swhid = res.get("deposit_swhid")
         if swhid and not deposit.swhid:
-            try:
-                record = record_service.record_cls.get_record(str(deposit.record_id))
-                frecord = next(iter(record.files.entries.values()))
-                root_dir = self._peek_zip_root(frecord)
-                if root_dir:
-                    swhid = (
-                        swhid.replace("path=/", f"path={root_dir}")
-                        if "path=/" in swhid
-                        else f"{swhid};path={root_dir}"
-                    )
-            except Exception:
-                # If the `path` cannot be determined, or the file has multiple files in its root, the swhid points to the root of the deposit
-                pass
-            self.update_swhid(deposit.id, swhid, uow=uow)
+            swhid = self._qualify_swhid(deposit, swhid)
+            self.update_swhid(deposit, swhid, uow=uow)
+        elif deposit.status == SWHDepositStatus.SUCCESS and not deposit.swhid:
+            # Metadata-only deposits get the SWHID they reference
+            if deposit.referenced_swhid:
+                self.update_swhid(deposit, deposit.referenced_swhid, uow=uow)
         return self.result_item(deposit)
 
+    def _qualify_swhid(self, deposit, swhid):
+        """Qualify the SWHID of a deposit with the path of the root directory of its archive."""
+        try:
+            record = record_service.record_cls.get_record(str(deposit.record_id))
+            frecord = next(iter(record.files.entries.values()))
+            root_dir = self._peek_zip_root(frecord)
+            if root_dir:
+                swhid = (
+                    swhid.replace("path=/", f"path={root_dir}")
+                    if "path=/" in swhid
+                    else f"{swhid};path={root_dir}"
+                )
+        except Exception:
+            # If the `path` cannot be determined, or the file has multiple files in its root, the swhid points to the root of the deposit
+            pass
+        return swhid
+
+    def fetch_status_change(self, deposit: SWHDeposit):
+        """Fetch the status of a deposit from SWH, without updating it locally.
+
+        :param deposit: The deposit.
+        :type deposit: SWHDeposit
+        :return: The ``(deposit_id, version_id, status, detail, swhid)`` change to pass to ``bulk_update_status``.
+        :rtype: tuple
+        """
+        res = self.get_controller(deposit).fetch_deposit_status(deposit.id)
+        status = res.get("deposit_status")
+        swhid = res.get("deposit_swhid")
+        if deposit.swhid:
+            swhid = None
+        elif swhid:
+            swhid = self._qualify_swhid(deposit, swhid)
+        elif self._parse_status(status) == SWHDepositStatus.SUCCESS:
+            swhid = deposit.referenced_swhid
+        return (
+            deposit.id,
+            deposit.model.version_id,
+            status,
+            res.get("deposit_status_detail"),
+            swhid,
+        )
+
+    @unit_of_work()
+    def bulk_update_status(self, changes, uow=None):
+        """Update the status of many deposits with set-based updates.
+
+        Instead of loading and committing each deposit, the changes are applied with two ``UPDATE`` statements per
+        target status. Each change carries the version of the deposit it was computed from, and is skipped if the
+        deposit was updated since (e.g. manually marked as failed), instead of silently overwriting that update. The
+        version counter of the updated deposits is incremented.
+
+        As in ``update_swhid``, a deposit with a SWHID is considered to be "SUCCESS". Remote statuses (e.g.
+        "loading") and their detail are stored even if the internal status is unchanged. Only status transitions are
+        recorded in the deposit history.
+
+        :param changes: The changes to apply, as ``(deposit_id, version_id, status, detail, swhid)`` tuples (see
+            ``fetch_status_change``). The status is either a remote or an internal status. The detail and SWHID can be
+            ``None``.
+        :type changes: Iterable[tuple]
+        :param uow: The unit of work.
+        :return: The number of updated deposits.
+        :rtype: int
+        """
+        groups = {}
+        for deposit_id, version_id, status, detail, swhid in changes:
+            internal_status = (
+                SWHDepositStatus.SUCCESS if swhid else self._parse_status(status)
+            )
+            if internal_status is None:
+                continue
+            remote_status = (
+                SWHRemoteDepositStatus.from_remote(status)
+                if isinstance(status, str)
+                else None
+            )
+            groups.setdefault(internal_status, []).append(
+                (str(deposit_id), version_id, remote_status, detail, swhid)
+            )
+
+        count = 0
+        events = []
+        for status, group in groups.items():
+            updated, transitions = self.record_cls.bulk_update_status(status, group)
+            events += [(object_uuid, status) for object_uuid in transitions]
+            count += len(updated)
+        if events:
+            uow.register(DepositEventOp(events))
+        return count
+
     def _peek_zip_root(self, file):
         """Peeks the root of the zip file and returns the directory name."""
         path = None
@@ -155,33 +444,38 @@ class SWHService(object):
             pass
         return path
 
-    @unit_of_work()
+    @traced("service.complete")
+    @traced_unit_of_work()
     def complete(self, id_: int, uow=None):
         """Complete a deposit.
 
-        :param id_: The ID of the deposit to complete.
-        :type id_: int
+        :param id_: The ID of the deposit to complete, or the deposit itself.
+        :type id_: Union[int, SWHDeposit]
         :param uow: The unit of work.
         :type uow: Union[UnitOfWork, None]
         :return: The completed deposit.
         :rtype: Deposit
         :raises DepositFailed: If the deposit has already failed.
+        :raises CircuitOpen: If requests to Software Heritage are suspended.
         """
-        deposit_res = self.read(id_)
-        deposit = deposit_res.deposit
+        deposit = self._get_deposit(id_)
         if deposit.status == SWHDepositStatus.FAILED:
             raise DepositFailed(
                 "Deposit has already failed. Cannot complete deposition."
             )
         try:
-            self.controller.complete_deposit(deposit.id)
+            self.get_controller(deposit).complete_deposit(deposit.id)
             self.update_status(deposit, SWHDepositStatus.WAITING, uow=uow)
+        except CircuitOpen:
+            # Software Heritage is unavailable, the deposit can be completed later
+            raise
         except Exception as exc:
             current_app.logger.exception("Deposit completion failed.")
             self.update_status(deposit, SWHDepositStatus.FAILED, uow=uow)
         return deposit
 
-    @unit_of_work()
+    @traced("service.upload_files")
+    @traced_unit_of_work()
     def upload_files(self, id_, files, uow=None):
         """Upload files to a deposit.
 
@@ -190,37 +484,73 @@ class SWHService(object):
         The files are first normalized by the service, assuring that the file(s) to be sent are compatible with the current
         implementation of the integration.
 
-        :param id_: The ID of the deposit.
-        :type id_: int
+        The archive is read from the local spool if it has a copy (see ``SWH_SPOOL_DIR``), otherwise it is copied
+        there first, so that retries do not read it from storage again.
+
+        Big archives are uploaded in parts (see ``SWH_UPLOAD_PART_SIZE``). Each uploaded part is recorded on the deposit
+        in its own transaction, so that an upload interrupted by a transient error resumes from the last uploaded part.
+
+        :param id_: The ID of the deposit, or the deposit itself.
+        :type id_: Union[int, SWHDeposit]
         :param files: The files to be uploaded.
         :type files: RecordFiles
         :param uow: The unit of work.
         :type uow: object, optional
         :return: The updated deposit.
         :rtype: object
+        :raises DepositUploadIncomplete: If the upload was interrupted by a transient error.
+        :raises CircuitOpen: If requests to Software Heritage are suspended.
         """
-        deposit_res = self.read(id_)
-        deposit = deposit_res.deposit
+        deposit = self._get_deposit(id_)
         try:
             self.validate_files(files)
             file = self._get_first_file(files)
-            fp = file.get_stream("rb")
             file_metadata = file.file.dumps()
             file_metadata["filename"] = file.file.key
-            self.controller.update_deposit_files(deposit.id, fp, file_metadata)
+            part_size = current_app.config["SWH_UPLOAD_PART_SIZE"]
+            start = deposit.uploaded_parts
+            with self.open_archive(file) as fp:
+                parts = iter_parts(fp, file_metadata, part_size=part_size, start=start)
+                for index, (part, part_metadata) in enumerate(parts, start):
+                    self.get_controller(deposit).update_deposit_files(
+                        deposit.id, part, part_metadata, replace=index == 0
+                    )
+                    self._save_upload_progress(deposit, index + 1)
+        except CircuitOpen:
+            # Software Heritage is unavailable, the upload can be resumed later
+            raise
+        except (ClientException, OSError) as exc:
+            if isinstance(exc, OSError) or exc.is_transient:
+                raise DepositUploadIncomplete(
+                    f"Upload of deposit {deposit.id} interrupted after "
+                    f"{deposit.uploaded_parts} part(s)."
+                ) from exc
+            current_app.logger.exception(str(exc))
+            self.update_status(deposit, SWHDepositStatus.FAILED, uow=uow)
         except Exception as exc:
             current_app.logger.exception(str(exc))
             self.update_status(deposit, SWHDepositStatus.FAILED, uow=uow)
         return deposit
 
+    def _save_upload_progress(self, deposit, parts):
+        """Record the number of uploaded parts in a separate transaction."""
+        deposit.uploaded_parts = parts
+        self._commit_deposit(deposit)
+
+    def _commit_deposit(self, deposit):
+        """Commit a deposit in a separate transaction."""
+        with TracedUnitOfWork() as uow:
+            uow.register(RecordCommitOp(deposit))
+            uow.commit()
+
     @unit_of_work()
     def update_swhid(self, id_: int, swhid: str, uow=None) -> None:
         """Update the SWHID and status of a deposit.
 
         The deposit is considered to be "SUCCESS" if the SWHID is successfully updated.
 
-        :param id_: The ID of the deposit.
-        :type id_: int
+        :param id_: The ID of the deposit, or the deposit itself.
+        :type id_: Union[int, SWHDeposit]
         :param swhid: The new SWHID to be assigned to the deposit.
         :type swhid: str
         :param uow: The unit of work to register the operation with. (optional)
@@ -228,8 +558,7 @@ class SWHService(object):
         :return: The updated deposit.
         :rtype: object
         """
-        deposit_res = self.read(id_)
-        deposit = deposit_res.deposit
+        deposit = self._get_deposit(id_)
         try:
             deposit.swhid = swhid
             self.update_status(deposit, SWHDepositStatus.SUCCESS, uow=uow)
@@ -259,6 +588,8 @@ class SWHService(object):
         It can be used to update the status from the remote, by parsing the status to an internal status.
         It can also be used to update the status to a new one.
 
+        Status changes are recorded in the deposit history, in the same unit of work.
+
         :param deposit: The deposit to be updated.
         :type deposit: SWHDeposit
         :param status: The new status of the deposit.
@@ -271,6 +602,79 @@ class SWHService(object):
         if deposit.status != internal_status:
             deposit.status = internal_status
             uow.register(RecordCommitOp(deposit))
+            uow.register(DepositEventOp([(deposit.record_id, internal_status)]))
+
+    @unit_of_work()
+    def archive_deposits(self, older_than, batch_size=None, uow=None):
+        """Move a batch of old terminal deposits to the archive table, keeping the deposit table small.
+
+        Archived deposits are still returned by ``get_record_deposit`` and ``get_record_deposits``.
+
+        :param older_than: Only archive deposits not updated since this date.
+        :type older_than: datetime
+        :param batch_size: The maximum number of deposits to archive, defaults to ``SWH_ARCHIVE_BATCH_SIZE``.
+        :type batch_size: int
+        :param uow: The unit of work.
+        :return: The number of archived deposits.
+        :rtype: int
+        """
+        batch_size = batch_size or current_app.config["SWH_ARCHIVE_BATCH_SIZE"]
+        return self.record_cls.archive(older_than, batch_size)
+
+    def get_stage_latencies(self, since=None, percentiles=(50, 90, 99)):
+        """Return the latency percentiles of each status transition of the deposits.
+
+        :param since: Only consider transitions after this date.
+        :type since: datetime
+        :param percentiles: The percentiles to compute.
+        :type percentiles: tuple
+        :return: The count and percentiles (in seconds) per transition, e.g. ``{"CREATED->WAITING": {"count": 10, "p50": 3.2}}``.
+        :rtype: dict
+        """
+        return stage_latencies(since=since, percentiles=percentiles)
+
+    @unit_of_work()
+    def update_remote_status(self, deposit: SWHDeposit, status, detail=None, uow=None):
+        """Store the status of the deposit reported by Software Heritage.
+
+        Unlike the internal status, it preserves where the deposit stands remotely (e.g. "verified" or "loading").
+
+        :param deposit: The deposit to be updated.
+        :type deposit: SWHDeposit
+        :param status: The remote status of the deposit.
+        :type status: str
+        :param detail: The remote status detail.
+        :type detail: str
+        :param uow: The unit of work.
+        """
+        remote_status = SWHRemoteDepositStatus.from_remote(status)
+        if (
+            deposit.remote_status != remote_status
+            or deposit.remote_status_detail != detail
+        ):
+            deposit.remote_status = remote_status
+            deposit.remote_status_detail = detail
+            uow.register(RecordCommitOp(deposit))
+
+    def search_by_remote_status(self, statuses, updated_before=None):
+        """Return the deposits with the given remote statuses, without querying Software Heritage.
+
+        It can be used to target deposits to re-poll or triage (e.g. deposits stuck in "verified").
+
+        :param statuses: The remote statuses, e.g. ``["verified", "loading"]``.
+        :type statuses: list
+        :param updated_before: Only return deposits not updated since this date.
+        :type updated_before: datetime
+        :return: A generator of deposits, oldest updated first.
+        """
+        statuses = [
+            SWHRemoteDepositStatus.from_remote(s) if isinstance(s, str) else s
+            for s in statuses
+        ]
+        for deposit in self.record_cls.get_by_remote_status(
+            statuses, updated_before=updated_before
+        ):
+            yield self.result_item(deposit)
 
     def _get_first_file(self, files_manager):
         fname = list(files_manager.entries.keys())[0]
@@ -308,6 +712,48 @@ class SWHService(object):
 
         return True
 
+    def _candidates_filter(self, exclude_archived=True):
+        """Build the search filter matching the checks of ``validate_record``."""
+        record_types = current_app.config["SWH_ACCEPTED_RECORD_TYPES"]
+        extensions = current_app.config["SWH_ACCEPTED_EXTENSIONS"]
+        max_size = current_app.config["SWH_MAX_FILE_SIZE"]
+
+        query = dsl.Q(
+            "bool",
+            filter=[
+                dsl.Q("terms", **{"metadata.resource_type.id": list(record_types)}),
+                dsl.Q("term", **{"access.record": "public"}),
+                dsl.Q("term", **{"access.files": "public"}),
+                dsl.Q("term", **{"files.count": 1}),
+                dsl.Q("terms", **{"files.types": list(extensions)}),
+                dsl.Q("range", **{"files.totalbytes": {"lte": max_size}}),
+                dsl.Q("term", deletion_status="P"),
+            ],
+        )
+        if exclude_archived:
+            query &= ~dsl.Q("exists", field="swh.swhid")
+        return query
+
+    def search_candidates(self, exclude_archived=True):
+        """Yield the ids of records that are candidates to be sent to Software Heritage.
+
+        The search index is used as a cheap pre-filter, so that only the matching records
+        need to be loaded and checked by ``validate_record`` (e.g. during backfills).
+
+        :param exclude_archived: Whether to skip records that already have a SWHID.
+        :type exclude_archived: bool
+        :return: A generator of record ids (PIDs).
+        :rtype: Iterator[str]
+        """
+        search = record_service.create_search(
+            system_identity,
+            record_service.record_cls,
+            record_service.config.search,
+            extra_filter=self._candidates_filter(exclude_archived=exclude_archived),
+        )
+        for hit in search.source(["id"]).scan():
+            yield hit["id"]
+
     def validate_files(self, files):
         """Validate files to be sent to Software Heritage.
 
@@ -337,3 +783,80 @@ class SWHService(object):
             raise InvalidRecord(f"File is too big: {max_size}")
 
         return fdata
+
+    @property
+    def spool(self):
+        """Return the local spool of the archives, if enabled (see ``SWH_SPOOL_DIR``)."""
+        path = current_app.config["SWH_SPOOL_DIR"]
+        if not path:
+            return None
+        return ArchiveSpool(path, current_app.config["SWH_SPOOL_MAX_SIZE"])
+
+    def open_archive(self, file):
+        """Open the archive to be sent to Software Heritage, preferably from the spool.
+
+        :param file: The file of the record.
+        :type file: FileRecord
+        :return: The archive, as a seekable readable buffer.
+        """
+        spool = self.spool
+        checksum = file.file.checksum
+        if spool and checksum:
+            fp = spool.get(checksum)
+            if fp is not None:
+                return fp
+        with span("storage.get_stream"):
+            fp = file.get_stream("rb")
+        if not (spool and checksum):
+            return fp
+        with fp:
+            copy = spool.put(checksum, fp, size=file.file.size)
+        return copy if copy is not None else file.get_stream("rb")
+
+    def _spool_archive(self, files, fp):
+        """Copy an archive already read from storage to the spool, if enabled."""
+        spool = self.spool
+        file = self._get_first_file(files)
+        checksum = file.file.checksum
+        if not spool or not checksum:
+            return
+        existing = spool.get(checksum)
+        if existing is not None:
+            existing.close()
+            return
+        fp.seek(0)
+        copy = spool.put(checksum, fp, size=file.file.size)
+        if copy is not None:
+            copy.close()
+
+    def prefetch_archive(self, files):
+        """Start reading the archive to be sent to Software Heritage in the background.
+
+        :param files: The files of the record.
+        :type files: RecordFiles
+        :return: The prefetch of the archive (see ``SWH_PREFETCH_MEMORY``).
+        :rtype: Prefetch
+        """
+        file = self._get_first_file(files)
+        spool = self.spool
+        fp = spool.get(file.file.checksum) if spool and file.file.checksum else None
+        if fp is None:
+            with span("storage.get_stream"):
+                fp = file.get_stream("rb")
+        return Prefetch(fp, max_memory=current_app.config["SWH_PREFETCH_MEMORY"])
+
+    def validate_archive(self, fp):
+        """Validate the content of the archive to be sent to Software Heritage.
+
+        The archive is checked for corruption, emptiness and the ``SWH_VALIDATION_*`` limits, so that invalid archives
+        are rejected before any request is sent to Software Heritage.
+
+        :param fp: The archive, as a seekable readable buffer.
+        :raises InvalidArchive: If the archive is invalid.
+        """
+        validate_archive(
+            fp,
+            max_members=current_app.config["SWH_VALIDATION_MAX_MEMBERS"],
+            max_size=current_app.config["SWH_VALIDATION_MAX_SIZE"],
+            max_ratio=current_app.config["SWH_VALIDATION_MAX_RATIO"],
+        )
@@ -2,9 +2,17 @@
 # SPDX-License-Identifier: MIT
 """Software heritage signals."""
 
+from invenio_swh.scheduler import stage_options
 from invenio_swh.tasks import process_published_record
 
 
 def post_publish_receiver(sender, pid=None, **kwargs):
-    """Signal receiver for post-publish signal."""
-    process_published_record.si(pid).apply(throw=True)
+    """Signal receiver for post-publish signal.
+
+    The deposit is created synchronously, unless a queue is configured for the "create" stage.
+    """
+    options = stage_options("create")
+    if options:
+        process_published_record.si(pid).apply_async(**options)
+    else:
+        process_published_record.si(pid).apply(throw=True)
@@ -0,0 +1,101 @@
+# SPDX-FileCopyrightText: 2026 CERN.
+# SPDX-License-Identifier: MIT
+"""Local spool of the archives being deposited in Software Heritage."""
+
+import hashlib
+import os
+import tempfile
+from pathlib import Path
+
+from invenio_swh.archive import CHUNK_SIZE
+
+
+class ArchiveSpool:
+    """Size-bounded directory of archive copies, keyed by checksum.
+
+    Archives are copied from storage the first time they are opened, so that retried and
+    resumed uploads read them from the local disk. Copies are written to a temporary
+    file, checked against their checksum and atomically renamed, therefore concurrent
+    workers never read partial copies.
+
+    When the spool grows over ``max_size`` bytes, the least recently used copies are
+    evicted. Copies being read are not affected, as open files outlive their removal.
+    """
+
+    def __init__(self, path, max_size):
+        """Instantiate the spool."""
+        self.path = Path(path)
+        self.max_size = max_size
+
+    def _path(self, checksum):
+        # e.g. "md5:0123..." is stored as "md5-0123..."
+        return self.path / checksum.replace(":", "-").replace("/", "-")
+
+    def get(self, checksum):
+        """Open the copy of an archive, or return ``None`` if it is not spooled."""
+        path = self._path(checksum)
+        try:
+            fp = open(path, "rb")
+        except FileNotFoundError:
+            return None
+        # The modification time orders the copies for eviction
+        os.utime(path)
+        return fp
+
+    def put(self, checksum, src, size=None):
+        """Copy an archive to the spool and open the copy.
+
+        The copy is checked against the checksum, so that truncated or corrupt copies are
+        never reused.
+
+        :param checksum: The checksum of the archive, e.g. ``"md5:0123..."``.
+        :type checksum: str
+        :param src: The archive, as a readable buffer.
+        :param size: The size of the archive, if known.
+        :type size: int
+        :return: The copy, or ``None`` if the archive is bigger than the spool or does not
+            match the checksum.
+        """
+        if size is not None and size > self.max_size:
+            return None
+        algorithm, _, expected = checksum.partition(":")
+        try:
+            digest = hashlib.new(algorithm)
+        except ValueError:
+            # Unknown algorithm, the copy cannot be checked
+            digest = None
+        self.path.mkdir(parents=True, exist_ok=True)
+        with tempfile.NamedTemporaryFile(
+            dir=self.path, suffix=".tmp", delete=False
+        ) as dst:
+            try:
+                for chunk in iter(lambda: src.read(CHUNK_SIZE), b""):
+                    dst.write(chunk)
+                    if digest:
+                        digest.update(chunk)
+            except BaseException:
+                os.unlink(dst.name)
+                raise
+        if digest and digest.hexdigest() != expected:
+            os.unlink(dst.name)
+            return None
+        os.replace(dst.name, self._path(checksum))
+        self.evict()
+        return self.get(checksum)
+
+    def evict(self):
+        """Remove the least recently used copies until the spool fits in ``max_size``."""
+        entries = []
+        for path in self.path.iterdir():
+            try:
+                stat = path.stat()
+            except FileNotFoundError:
+                continue
+            if path.suffix != ".tmp":
+                entries.append((stat.st_mtime, stat.st_size, path))
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in sorted(entries):
+            if total <= self.max_size:
+                break
+            path.unlink(missing_ok=True)
+            total -= size
@@ -1,22 +1,46 @@
 # SPDX-FileCopyrightText: 2023-2024 CERN.
 # SPDX-License-Identifier: MIT
 """Celery tasks for Invenio / Software Heritage integration."""
+
+import math
+import time
 from datetime import datetime, timedelta
 
 from celery.app import shared_task
 from flask import current_app
 from invenio_access.permissions import system_identity
+from invenio_cache import current_cache
 from invenio_rdm_records.proxies import current_rdm_records_service as record_service
-from invenio_records_resources.services.uow import UnitOfWork
 
 from invenio_swh.errors import (
+    CircuitOpen,
+    DepositAlreadyCreated,
+    DepositFailed,
+    DepositLocked,
     DepositNotFound,
     DepositPollFailed,
+    DepositUploadIncomplete,
     DepositWaiting,
     InvalidRecord,
 )
 from invenio_swh.models import SWHDepositStatus
+from invenio_swh.polling import PollingPolicy
 from invenio_swh.proxies import current_swh_service as service
+from invenio_swh.scheduler import stage_options
+from invenio_swh.tracing import TracedUnitOfWork
+
+polling_policy = PollingPolicy()
+
+
+def defer(task, exc, args, kwargs=None, **options):
+    """Re-schedule a task once requests to Software Heritage are allowed again.
+
+    A new task is sent instead of retrying, so that deferrals don't count as failed attempts.
+    """
+    current_app.logger.warning(
+        f"Software Heritage is unavailable, deferring {task.name} by {exc.retry_after}s."
+    )
+    task.apply_async(args=args, kwargs=kwargs, countdown=exc.retry_after, **options)
 
 
 @shared_task(max_retries=3)
@@ -26,11 +50,14 @@ def process_published_record(pid):
     Attempts to create a deposit using Software Heritage service. The local deposit creation is carried out  in a separate transaction
     in order to store the deposit ID and possible failed status.
 
-    Within a separate, single transaction, it uploads files associated with the record to the deposit and then completes it.
+    After the deposit is created, the function daisy chains the stage tasks that upload the files (``upload_deposit``),
+    complete the deposit (``complete_deposit``) and poll its status (``poll_deposits``). Each stage is routed to its own
+    queue (see ``SWH_TASK_QUEUES``), so that slow uploads do not block the creation of other deposits. New versions
+    with an unchanged archive get a metadata-only deposit, which is complete right away and only polled.
 
-    After the deposit is completed, the function daisy chains another celery task to start polling the deposit status.
-
-    If the record is invalid (e.g. not a software record), the function does not retry.
+    If the record is invalid (e.g. not a software record), or its deposit is already (being) created by another task,
+    the function does not retry. If Software Heritage is unavailable (see ``SWH_CIRCUIT_BREAKER_THRESHOLD``), the task
+    is deferred.
 
     Args:
     ----
@@ -39,7 +66,7 @@ def process_published_record(pid):
     """
     try:
         record = record_service.read(system_identity, id_=pid)
-        # Create the deposit in a separate transaction. If it fails, no deposit is created locally.
+        # Create the deposit in a separate transaction. If it fails, the deposit stays "NEW" and is created on retry.
         deposit = service.create(record._record)
     except InvalidRecord as exc:
         # If the record is invalid, don't retry the task.
@@ -47,56 +74,172 @@ def process_published_record(pid):
             "Invalid record, skipping deposit creation.", exc_info=True
         )
         return
+    except (DepositLocked, DepositAlreadyCreated):
+        # Duplicate delivery, the deposit is (being) created by another task.
+        current_app.logger.info(
+            "Deposit already being created, skipping deposit creation.", exc_info=True
+        )
+        return
+    except CircuitOpen as exc:
+        defer(process_published_record, exc, (pid,), **stage_options("create"))
+        return
     except Exception as exc:
         # If it fails, the deposit was rolled back. We can create it later if the record is valid.
         current_app.logger.exception("Failed to create deposition for archival.")
         process_published_record.retry(exc=exc)
         return
 
+    # Metadata-only deposits of unchanged archives are complete already, they are only polled
+    if deposit.status == SWHDepositStatus.WAITING:
+        schedule_polls([str(deposit.id)])
+        return
+
+    # Small archives are prioritised and routed to their own lane (see ``SWH_SMALL_ARCHIVE_SIZE``)
+    size = next(iter(record._record.files.entries.values())).file.size
+    upload_deposit.apply_async(
+        args=(str(deposit.id),),
+        **stage_options("upload", size=size, created=deposit.model.created),
+    )
+
+
+@shared_task(ignore_result=True, bind=True)
+def upload_deposit(self, id_):
+    """Upload the files of the record to a created deposit.
+
+    If the upload is interrupted by a transient error, the task is retried and the upload resumes from the last
+    uploaded part, up to ``SWH_UPLOAD_MAX_RETRIES`` times. After that, the deposit is marked as failed.
+
+    If the upload succeeds, the task daisy chains ``complete_deposit``.
+
+    Args:
+    ----
+        self: The Celery task instance.
+        id_ (str): The ID of the deposit.
+
+    """
+    try:
+        deposit = service.read(id_).deposit
+        files = deposit.record.files
+        with TracedUnitOfWork() as uow:
+            deposit = service.upload_files(deposit, files, uow=uow)
+            uow.commit()
+    except DepositNotFound:
+        return
+    except CircuitOpen as exc:
+        options = stage_options(
+            "upload", size=deposit.archive_size, created=deposit.model.created
+        )
+        defer(upload_deposit, exc, (id_,), **options)
+        return
+    except DepositUploadIncomplete as exc:
+        retries = self.request.retries
+        if retries >= current_app.config["SWH_UPLOAD_MAX_RETRIES"]:
+            current_app.logger.exception("Failed to resume deposit upload.")
+            service.update_status(deposit, SWHDepositStatus.FAILED)
+            return
+        current_app.logger.warning(str(exc))
+        raise self.retry(
+            exc=exc,
+            countdown=current_app.config["SWH_UPLOAD_RETRY_DELAY"],
+            max_retries=None,
+            **stage_options(
+                "upload",
+                size=deposit.archive_size,
+                retries=retries + 1,
+                created=deposit.model.created,
+            ),
+        )
+    except Exception:
+        # Don't retry the task if failed.
+        current_app.logger.exception("Failed to upload deposit files.")
+        return
+
+    if deposit.status == SWHDepositStatus.FAILED:
+        return
+
+    complete_deposit.apply_async(args=(id_,), **stage_options("complete"))
+
+
+@shared_task(ignore_result=True)
+def complete_deposit(id_):
+    """Complete a deposit whose files were uploaded.
+
+    If the completion succeeds, the task daisy chains ``poll_deposits`` (see ``schedule_polls``).
+
+    Args:
+    ----
+        id_ (str): The ID of the deposit.
+
+    """
     try:
-        with UnitOfWork() as uow:
-            service.upload_files(deposit.id, record._record.files, uow=uow)
-            service.complete(deposit.id, uow=uow)
+        with TracedUnitOfWork() as uow:
+            deposit = service.complete(id_, uow=uow)
             uow.commit()
-    except Exception as exc:
+    except (DepositNotFound, DepositFailed):
+        return
+    except CircuitOpen as exc:
+        defer(complete_deposit, exc, (id_,), **stage_options("complete"))
+        return
+    except Exception:
         # Don't retry the task if failed.
         current_app.logger.exception("Failed to complete deposit archival.")
         return
 
-    poll_deposit.delay(str(deposit.id))
+    if deposit.status == SWHDepositStatus.FAILED:
+        return
+
+    schedule_polls([id_])
 
 
 @shared_task(
-    retry_backoff=60,
-    autoretry_for=(DepositWaiting, DepositPollFailed),
-    max_retries=5,
+    max_retries=None,
     throws=(DepositWaiting, DepositPollFailed),
     bind=True,
 )
-def poll_deposit(self, id_):
+def poll_deposit(self, id_, size=None, started=None, seen=None):
     """Poll the status of a deposit.
 
-    ``retry_backoff`` specifices that the time between retries will increase exponentially, starting at, e.g, 60 seconds (60, 120, etc  up until the default of 10 minutes).
+    The next poll is scheduled by the ``PollingPolicy``, close to the expected completion of the deposit given the
+    size of its archive and its remote status (e.g. "deposited", "verified" or "loading"). Deposits still waiting
+    after ``SWH_POLL_MAX_WAIT`` seconds are left to ``cleanup_depositions``.
+
+    Deposits are now polled by ``poll_deposits``, this task keeps serving the polls that are already queued.
 
     Args:
     ----
         self: The Celery task instance.
         id_ (str): The ID of the deposit to poll.
+        size (int): The size of the archive, computed on the first poll.
+        started (float): The timestamp of the first poll.
+        seen (dict): The timestamp each remote status was first seen at.
 
     Raises:
     ------
         DepositWaiting: If the deposit status is "waiting".
 
     """
+    now = time.time()
+    started = started or now
+    seen = dict(seen or {})
     try:
         deposit = service.read(id_).deposit
-        service.sync_status(deposit.id)
+        if size is None:
+            size = deposit.archive_size
+        deposit = service.sync_status(deposit).deposit
     except DepositNotFound:
         # If the deposit never existed, don't retry the task.
         return
+    except CircuitOpen as exc:
+        kwargs = {"size": size, "started": started, "seen": seen}
+        defer(poll_deposit, exc, (id_,), kwargs=kwargs, **stage_options("poll"))
+        return
     except Exception:
         # For other exceptions, retry the task.
-        raise DepositPollFailed("Deposit polling failed.")
+        raise self.retry(
+            exc=DepositPollFailed("Deposit polling failed."),
+            countdown=polling_policy.backoff(self.request.retries),
+            kwargs={"size": size, "started": started, "seen": seen},
+        )
 
     # If the deposit failed already, don't do anything else
     if deposit.status == SWHDepositStatus.FAILED:
@@ -107,17 +250,163 @@ def poll_deposit(self, id_):
         and deposit.record_id
         and deposit.swhid
     ):
+        polling_policy.observe(size, seen, now)
         record_service.indexer.index_by_id(deposit.record_id)
         return
 
-    # Manually set status to WAITING on last retry.
-    # Celery has a bug where it doesn't raise MaxRetriesExceededError, therefore we need to check retries manually.
-    if self.request.retries == 5:
+    # Leave the deposit WAITING for the cleanup task once the maximum wait is reached.
+    if now - started >= current_app.config["SWH_POLL_MAX_WAIT"]:
         service.update_status(deposit, SWHDepositStatus.WAITING)
         return
 
     if deposit.status == SWHDepositStatus.WAITING:
-        raise DepositWaiting("Deposit is still waiting")
+        remote_status = deposit.remote_status.remote if deposit.remote_status else None
+        if remote_status:
+            seen.setdefault(remote_status, now)
+        countdown = polling_policy.next_countdown(
+            size, remote_status, seen, now, retries=self.request.retries
+        )
+        raise self.retry(
+            exc=DepositWaiting("Deposit is still waiting"),
+            countdown=countdown,
+            kwargs={"size": size, "started": started, "seen": seen},
+        )
+
+
+def schedule_polls(ids, countdown=None, state=None):
+    """Dispatch ``poll_deposits`` tasks for the given deposits, in batches of ``SWH_POLL_BATCH_SIZE``.
+
+    Args:
+    ----
+        ids (list): The IDs of the deposits to poll.
+        countdown (int): The delay of the polls, in seconds.
+        state (dict): The polling state of the deposits, by ID (see ``poll_deposits``).
+
+    """
+    ids = list(ids)
+    state = state or {}
+    batch_size = current_app.config["SWH_POLL_BATCH_SIZE"]
+    for start in range(0, len(ids), batch_size):
+        batch = ids[start : start + batch_size]
+        poll_deposits.apply_async(
+            args=(batch,),
+            kwargs={"state": {id_: state[id_] for id_ in batch if id_ in state}},
+            countdown=countdown,
+            **stage_options("poll"),
+        )
+
+
+@shared_task(ignore_result=True)
+def poll_deposits(ids, state=None):
+    """Poll the status of many deposits in a single task.
+
+    Batched variant of ``poll_deposit``, dispatched by ``schedule_polls`` once deposits are complete. The deposits are
+    loaded in a single query, their statuses are fetched through the same Software Heritage connections and applied
+    with a single ``bulk_update_status``.
+
+    Duplicate IDs are coalesced, within the batch and across the batches being polled at the same time. Deposits
+    still waiting are re-scheduled by the ``PollingPolicy``, together with the deposits due around the same time.
+
+    Args:
+    ----
+        ids (list): The IDs of the deposits to poll.
+        state (dict): The polling state of each deposit, by ID: the size of its archive (``size``), the timestamp of
+            its first poll (``started``), the timestamp each remote status was first seen at (``seen``) and the
+            number of polls (``retries``).
+
+    """
+    now = time.time()
+    window = current_app.config["SWH_POLL_BATCH_WINDOW"]
+    # The key of a deposit being polled expires after the window, if the task is lost
+    keys = {id_: f"invenio-swh:poll:{id_}" for id_ in map(str, ids)}
+    ids = [
+        id_ for id_, key in keys.items() if current_cache.add(key, now, timeout=window)
+    ]
+    if not ids:
+        return
+    try:
+        _poll_batch(ids, state or {}, now)
+    finally:
+        # Re-scheduled polls are not dropped, whatever their countdown
+        current_cache.delete_many(*(keys[id_] for id_ in ids))
+
+
+def _poll_batch(ids, state, now):
+    """Poll a batch of deposits and re-schedule the ones still waiting (see ``poll_deposits``)."""
+    window = current_app.config["SWH_POLL_BATCH_WINDOW"]
+    deposits = service.record_cls.get_by_ids(ids)
+    states = {}
+    for deposit in deposits:
+        deposit_state = state.get(deposit.id) or {}
+        states[deposit.id] = {
+            "size": (
+                deposit_state["size"]
+                if "size" in deposit_state
+                else deposit.archive_size
+            ),
+            "started": deposit_state.get("started", now),
+            "seen": dict(deposit_state.get("seen") or {}),
+            "retries": deposit_state.get("retries", 0),
+        }
+
+    changes, remote_statuses, countdowns = [], {}, {}
+    for deposit in deposits:
+        try:
+            change = service.fetch_status_change(deposit)
+        except CircuitOpen as exc:
+            countdowns[deposit.id] = exc.retry_after
+            continue
+        except Exception:
+            current_app.logger.exception(f"Failed to poll deposit {deposit.id}.")
+            countdowns[deposit.id] = polling_policy.backoff(
+                states[deposit.id]["retries"]
+            )
+            continue
+        changes.append(change)
+        remote_statuses[deposit.id] = change[2]
+
+    try:
+        service.bulk_update_status(changes)
+    except Exception:
+        # The deposits are still waiting, they are polled again
+        current_app.logger.exception("Failed to update the polled deposit statuses.")
+
+    pending = {}
+    max_wait = current_app.config["SWH_POLL_MAX_WAIT"]
+    for deposit in service.record_cls.get_by_ids(ids):
+        deposit_state = states[deposit.id]
+        countdown = countdowns.get(deposit.id)
+        if countdown is None:
+            if deposit.status == SWHDepositStatus.FAILED:
+                continue
+            elif deposit.status == SWHDepositStatus.SUCCESS and deposit.swhid:
+                size, seen = deposit_state["size"], deposit_state["seen"]
+                polling_policy.observe(size, seen, now)
+                if deposit.record_id:
+                    record_service.indexer.index_by_id(deposit.record_id)
+                continue
+            elif deposit.status != SWHDepositStatus.WAITING:
+                continue
+            # Leave the deposit WAITING for the cleanup task once the maximum wait is reached.
+            if now - deposit_state["started"] >= max_wait:
+                continue
+            remote_status = remote_statuses.get(deposit.id)
+            if remote_status:
+                deposit_state["seen"].setdefault(remote_status, now)
+            countdown = polling_policy.next_countdown(
+                deposit_state["size"],
+                remote_status,
+                deposit_state["seen"],
+                now,
+                retries=deposit_state["retries"],
+            )
+        deposit_state["retries"] += 1
+        # Deposits due in the same window are polled together
+        countdown = max(math.ceil(countdown / window), 1) * window
+        pending.setdefault(countdown, []).append(deposit.id)
+
+    for countdown, batch in pending.items():
+        schedule_polls(batch, countdown=countdown, state=states)
 
 
 @shared_task()
@@ -128,28 +417,59 @@ def cleanup_depositions():
             "Sofware Heritage interation is not enabled, cleanup task can't run."
         )
         return
-    Deposit = service.record_cls
-    DepositModel = Deposit.model_cls
+    controllers = [service.controller, *service.controllers.values()]
+    if all(controller.breaker.is_open() for controller in controllers):
+        current_app.logger.warning(
+            "Software Heritage is unavailable, skipping the cleanup of depositions."
+        )
+        return
     # query for records that are stuck in "waiting"
-    res = DepositModel.query.filter(
-        DepositModel.status == SWHDepositStatus.WAITING,
-        DepositModel.updated < datetime.now() - timedelta(days=1),
+    res = service.record_cls.get_by_status(
+        [SWHDepositStatus.WAITING],
+        updated_before=datetime.now() - timedelta(days=1),
     )
 
-    for _deposit in res:
-        deposit = service.record_cls.create(_deposit.object_uuid)
+    changes = []
+    for deposit in res:
         try:
-            # Sync and re-index the record if the deposit was successful
-            service.sync_status(deposit.id)
-            if deposit.status == SWHDepositStatus.SUCCESS and deposit.record_id:
-                record_service.indexer.index_by_id(deposit.record_id)
-        except Exception as ex:
+            changes.append(service.fetch_status_change(deposit))
+        except CircuitOpen:
+            # The collection of the deposit is unavailable, the deposit is synced on the next run
+            continue
+        except Exception:
             # If the sync failed for any reason, set the status to "FAILED"
-            try:
-                service.update_status(deposit, SWHDepositStatus.FAILED)
-            except Exception:
-                current_app.logger.exception(
-                    "Failed to sync deposit status during cleanup.",
-                    extra={"deposit": deposit.id},
-                )
-                # Gracefully handle update failure, the deposit can be retried in the future
+            version_id = deposit.model.version_id
+            changes.append(
+                (deposit.id, version_id, SWHDepositStatus.FAILED, None, None)
+            )
+
+    try:
+        service.bulk_update_status(changes)
+    except Exception:
+        # Gracefully handle update failure, the deposits can be retried in the future
+        current_app.logger.exception("Failed to sync deposit statuses during cleanup.")
+        return
+
+    # Re-index the records of the successful deposits
+    for deposit_id, _, _, _, swhid in changes:
+        if swhid:
+            deposit = service.read(deposit_id).deposit
+            if deposit.record_id:
+                record_service.indexer.index_by_id(deposit.record_id)
+
+
+@shared_task(ignore_result=True)
+def archive_deposits():
+    """Move the deposits that reached a terminal status long ago to the archive table.
+
+    Deposits are archived in batches of ``SWH_ARCHIVE_BATCH_SIZE``, each in its own transaction, once they are older
+    than ``SWH_ARCHIVE_AFTER``.
+    """
+    archive_after = current_app.config.get("SWH_ARCHIVE_AFTER")
+    if not current_app.config.get("SWH_ENABLED") or not archive_after:
+        return
+    older_than = datetime.utcnow() - archive_after
+    count = 0
+    while archived := service.archive_deposits(older_than):
+        count += archived
+    current_app.logger.info(f"Archived {count} Software Heritage deposits.")
@@ -0,0 +1,141 @@
+# SPDX-FileCopyrightText: 2026 CERN.
+# SPDX-License-Identifier: MIT
+"""Opt-in tracing of the Software Heritage deposit pipeline.
+
+Spans measure the time spent in each stage of a deposit (e.g. the metadata dump, the
+requests to Software Heritage or the database commits, see ``TracedUnitOfWork``).
+Finished spans are passed to the hooks of ``SWH_TRACING_HOOKS`` and, if
+``opentelemetry-api`` is installed, are also recorded as OpenTelemetry spans.
+
+Tracing is sampled per trace: a root span is sampled with probability
+``SWH_TRACING_SAMPLE_RATE``, and its child spans follow its decision.
+"""
+
+import random
+import time
+from contextlib import ExitStack, contextmanager
+from contextvars import ContextVar
+from functools import wraps
+
+from flask import current_app
+from invenio_db import db
+from invenio_records_resources.services.uow import UnitOfWork
+from werkzeug.utils import import_string
+
+try:
+    from opentelemetry import trace
+except ImportError:
+    trace = None
+
+_sampled = ContextVar("invenio_swh_tracing_sampled", default=None)
+
+
+def _get_hooks():
+    """Return the tracing hooks, importing them if given as import strings."""
+    return [
+        import_string(hook) if isinstance(hook, str) else hook
+        for hook in current_app.config["SWH_TRACING_HOOKS"]
+    ]
+
+
+@contextmanager
+def span(name, **attributes):
+    """Trace a block of code.
+
+    Each hook is called with the name, the duration (in seconds), the attributes and the
+    exception (if any) of the span.
+
+    :param name: The name of the span, e.g. ``"client.create_deposit"``.
+    :type name: str
+    :param attributes: The attributes of the span, e.g. the deposit id.
+    """
+    sampled = _sampled.get()
+    if sampled is None:
+        # Root span, decide whether the trace is sampled
+        sampled = current_app.config["SWH_TRACING_ENABLED"] and (
+            random.random() < current_app.config["SWH_TRACING_SAMPLE_RATE"]
+        )
+    if not sampled:
+        token = _sampled.set(False)
+        try:
+            yield
+        finally:
+            _sampled.reset(token)
+        return
+
+    token = _sampled.set(True)
+    error = None
+    start = time.perf_counter()
+    try:
+        with ExitStack() as stack:
+            if trace is not None:
+                tracer = trace.get_tracer("invenio-swh")
+                stack.enter_context(
+                    tracer.start_as_current_span(name, attributes=attributes)
+                )
+            yield
+    except BaseException as exc:
+        error = exc
+        raise
+    finally:
+        duration = time.perf_counter() - start
+        _sampled.reset(token)
+        for hook in _get_hooks():
+            try:
+                hook(name, duration, attributes, error)
+            except Exception:
+                current_app.logger.exception(f"Tracing hook failed: {hook}")
+
+
+def traced(name):
+    """Decorate a function to trace each of its calls in a span."""
+
+    def decorator(f):
+        @wraps(f)
+        def inner(*args, **kwargs):
+            with span(name):
+                return f(*args, **kwargs)
+
+        return inner
+
+    return decorator
+
+
+class TracedUnitOfWork(UnitOfWork):
+    """Unit of work tracing its commit in a ``db.commit`` span."""
+
+    def commit(self):
+        """Commit the unit of work."""
+        with span("db.commit"):
+            super().commit()
+
+
+def traced_unit_of_work():
+    """Decorator injecting a ``TracedUnitOfWork`` if none is provided.
+
+    It behaves like ``invenio_records_resources.services.uow.unit_of_work``.
+    """
+
+    def decorator(f):
+        @wraps(f)
+        def inner(self, *args, **kwargs):
+            if kwargs.get("uow") is not None:
+                return f(self, *args, **kwargs)
+            with TracedUnitOfWork(db.session) as uow:
+                kwargs["uow"] = uow
+                res = f(self, *args, **kwargs)
+                uow.commit()
+                return res
+
+        return inner
+
+    return decorator
+
+
+def log_span(name, duration, attributes, error):
+    """Tracing hook logging the spans, e.g. to profile the pipeline locally."""
+    status = f" ({type(error).__name__})" if error else ""
+    current_app.logger.info(
+        f"invenio-swh span {name}: {duration * 1000:.1f}ms{status}",
+        extra={"span": name, "duration": duration, **attributes},
+    )
@@ -0,0 +1,131 @@
+# SPDX-FileCopyrightText: 2026 CERN.
+# SPDX-License-Identifier: MIT
+"""REST views of invenio-swh."""
+
+import hashlib
+
+from flask import abort, current_app, g, jsonify, request
+from flask.blueprints import Blueprint
+from invenio_access.permissions import authenticated_user
+
+from invenio_swh.models import SWHDepositStatus
+from invenio_swh.proxies import current_swh_service
+
+blueprint = Blueprint(
+    "invenio_swh",
+    __name__,
+    template_folder="templates",
+)
+
+
+def dump_deposit(deposit, record_id=None):
+    """Dump the public fields of a deposit, identified by the requested record PID."""
+    return {
+        "record_id": record_id or str(deposit.record_id),
+        "status": deposit.status.name.lower() if deposit.status else None,
+        "swhid": deposit.swhid,
+    }
+
+
+BADGE_MESSAGES = {
+    SWHDepositStatus.NEW: ("pending", "lightgrey"),
+    SWHDepositStatus.CREATED: ("pending", "lightgrey"),
+    SWHDepositStatus.WAITING: ("in progress", "yellow"),
+    SWHDepositStatus.SUCCESS: ("archived", "brightgreen"),
+    SWHDepositStatus.FAILED: ("failed", "red"),
+}
+"""Badge message and color of each deposit status."""
+
+
+def dump_badge(deposit):
+    """Dump the status of a deposit as a badge, in the shields.io endpoint format."""
+    message, color = BADGE_MESSAGES.get(deposit.status, ("unknown", "lightgrey"))
+    badge = {
+        "schemaVersion": 1,
+        "label": "Software Heritage",
+        "message": message,
+        "color": color,
+    }
+    if deposit.swhid:
+        base_url = current_app.config["SWH_UI_BASE_URL"].rstrip("/")
+        badge["link"] = f"{base_url}/{deposit.swhid}"
+    return badge
+
+
+def _resolve_record_ids(values):
+    """Resolve the requested record PIDs, aborting on invalid requests.
+
+    Records that the requester cannot read are omitted, as if they did not exist.
+    """
+    max_records = current_app.config["SWH_STATUS_MAX_RECORDS"]
+    if not values:
+        abort(400, "At least one record_id is required.")
+    if len(values) > max_records:
+        abort(400, f"At most {max_records} record ids can be requested at once.")
+    record_ids = current_swh_service.resolve_record_ids(values)
+    readable = current_swh_service.filter_readable_records(
+        g.identity, record_ids.values()
+    )
+    return {pid: id_ for pid, id_ in record_ids.items() if id_ in readable}
+
+
+def _set_cache_control(response, max_age):
+    """Let shared caches store the response, unless it depends on the requester."""
+    if authenticated_user in g.identity.provides:
+        response.cache_control.private = True
+    else:
+        response.cache_control.public = True
+    response.cache_control.max_age = max_age
+
+
+@blueprint.route("/swh/deposits", methods=["GET"])
+def get_deposits():
+    """Return the deposit status and SWHID of many records.
+
+    The records are given as repeated ``record_id`` query arguments, with their PID
+    (internal record ids are also accepted). Unknown records, records the requester
+    cannot read, or records without a deposit, are omitted. Responses carry a weak ETag, derived from the version of the
+    returned deposits, and can be cached for ``SWH_STATUS_MAX_AGE`` seconds.
+    """
+    pids = _resolve_record_ids(request.args.getlist("record_id"))
+    results = current_swh_service.get_record_deposits(pids.values())
+    record_pids = {record_id: pid for pid, record_id in pids.items()}
+
+    versions = hashlib.md5()
+    hits = []
+    for res in results:
+        pid = record_pids[str(res.deposit.record_id)]
+        versions.update(f"{pid}:{res.deposit.model.version_id};".encode())
+        hits.append(dump_deposit(res.deposit, record_id=pid))
+
+    response = jsonify({"hits": hits})
+    response.set_etag(versions.hexdigest(), weak=True)
+    _set_cache_control(response, current_app.config["SWH_STATUS_MAX_AGE"])
+    return response.make_conditional(request)
+
+
+@blueprint.route("/swh/deposits/<record_id>", methods=["GET"])
+def get_deposit(record_id):
+    """Return the deposit status, SWHID and badge of a record, given its PID.
+
+    Responses carry a strong ETag, derived from the version of the deposit. Successful
+    deposits do not change anymore, therefore they are cached for
+    ``SWH_STATUS_SUCCESS_MAX_AGE`` seconds instead of ``SWH_STATUS_MAX_AGE``.
+    """
+    pids = _resolve_record_ids([record_id])
+    if record_id not in pids:
+        abort(404, "Record not found.")
+    deposit = current_swh_service.get_record_deposit(pids[record_id]).deposit
+    if deposit.model is None:
+        abort(404, "The record has no Software Heritage deposit.")
+
+    response = jsonify(
+        {**dump_deposit(deposit, record_id=record_id), "badge": dump_badge(deposit)}
+    )
+    response.set_etag(f"{record_id}-{deposit.model.version_id}")
+    if deposit.status == SWHDepositStatus.SUCCESS:
+        max_age = current_app.config["SWH_STATUS_SUCCESS_MAX_AGE"]
+    else:
+        max_age = current_app.config["SWH_STATUS_MAX_AGE"]
+    _set_cache_control(response, max_age)
+    return response.make_conditional(request)
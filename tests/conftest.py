@@ -37,7 +37,7 @@ def zip_file():
 @pytest.fixture(scope="module")
 def create_app(instance_path, mock_client):
     """Application factory fixture."""
-    with patch("invenio_swh.ext.sword2", mock_client):
+    with patch("sword2.Connection", mock_client.Connection):
         with patch.object(SWHCLient, "_parse_response", lambda x, y: y):
             yield _create_api
 
@@ -220,6 +220,8 @@ def mock_client():
     def _request(*args, **kwargs):
         assert len(args) >= 2
         response = MagicMock()
+        # No response headers (e.g. validators)
+        response.get.return_value = None
         if args[1] == "POST":
             if "/metadata" in args[0]:
                 # Deposit completion
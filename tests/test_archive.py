@@ -0,0 +1,141 @@
+# SPDX-FileCopyrightText: 2026 CERN.
+# SPDX-License-Identifier: MIT
+"""Test archive handling."""
+
+import tarfile
+import threading
+from io import BytesIO
+from zipfile import ZIP_DEFLATED, ZipFile
+
+import pytest
+
+from invenio_swh.archive import Prefetch, iter_parts, validate_archive
+from invenio_swh.errors import InvalidArchive
+
+
+def _make_zip(members):
+    fp = BytesIO()
+    with ZipFile(fp, "w") as archive:
+        for name, data in members:
+            archive.writestr(name, data)
+    fp.seek(0)
+    return fp
+
+
+def test_iter_parts_single():
+    """Test that small archives are uploaded in a single part."""
+    fp = _make_zip([("a.txt", "hello")])
+    metadata = {"filename": "test.zip", "size": len(fp.getvalue())}
+
+    parts = list(iter_parts(fp, metadata, part_size=None))
+    assert parts == [(fp, metadata)]
+    # Resuming an upload that was already complete
+    assert list(iter_parts(fp, metadata, part_size=None, start=1)) == []
+
+
+def test_iter_parts_split():
+    """Test that big ZIP archives are split and the upload can be resumed."""
+    members = [(f"src/{i}.bin", bytes([i]) * 4096) for i in range(4)]
+    fp = _make_zip(members)
+    metadata = {"filename": "test.zip", "size": len(fp.getvalue())}
+
+    parts = list(iter_parts(fp, metadata, part_size=100))
+    assert len(parts) == 4
+    names = []
+    for part, part_metadata in parts:
+        assert part_metadata["filename"].startswith("test.part")
+        assert part_metadata["checksum"].startswith("md5:")
+        with ZipFile(part) as archive:
+            names.extend(archive.namelist())
+    assert names == [name for name, _ in members]
+
+    resumed = list(iter_parts(fp, metadata, part_size=100, start=3))
+    assert [m["filename"] for _, m in resumed] == ["test.part4.zip"]
+
+
+def _make_tar(members, mode="w:gz"):
+    fp = BytesIO()
+    with tarfile.open(fileobj=fp, mode=mode) as archive:
+        for name, data in members:
+            info = tarfile.TarInfo(name)
+            info.size = len(data)
+            archive.addfile(info, BytesIO(data))
+    fp.seek(0)
+    return fp
+
+
+def test_validate_archive_zip():
+    """Test that corrupt, empty and oversized ZIP archives are rejected."""
+    validate_archive(_make_zip([("a.txt", "hello")]))
+
+    with pytest.raises(InvalidArchive):
+        validate_archive(_make_zip([]))
+
+    # Truncated archive, without its central directory
+    data = _make_zip([("a.txt", "hello")]).getvalue()
+    with pytest.raises(InvalidArchive):
+        validate_archive(BytesIO(data[:-20]))
+
+    # Highly compressed members
+    fp = BytesIO()
+    with ZipFile(fp, "w", compression=ZIP_DEFLATED) as archive:
+        archive.writestr("a.txt", "0" * 100000)
+    with pytest.raises(InvalidArchive):
+        validate_archive(fp, max_ratio=100)
+    validate_archive(fp, max_ratio=None)
+
+
+def test_validate_archive_tar():
+    """Test that TAR archives are checked against the limits and their stream."""
+    members = [(f"src/{i}.txt", b"hello") for i in range(3)]
+    for mode in ("w", "w:gz", "w:bz2", "w:xz"):
+        fp = _make_tar(members, mode=mode)
+        validate_archive(fp, max_members=3, max_size=15)
+        with pytest.raises(InvalidArchive):
+            validate_archive(fp, max_members=2)
+        with pytest.raises(InvalidArchive):
+            validate_archive(fp, max_size=14)
+
+    data = _make_tar(members, mode="w:xz").getvalue()
+    with pytest.raises(InvalidArchive):
+        validate_archive(BytesIO(data[:-10]))
+    with pytest.raises(InvalidArchive):
+        validate_archive(BytesIO(b"not an archive"))
+
+
+def test_prefetch():
+    """Test that archives are copied in the background, in memory or on disk."""
+    data = _make_zip([("a.txt", "hello")]).getvalue()
+    with Prefetch(BytesIO(data)) as prefetch:
+        assert prefetch.result().read() == data
+
+    with Prefetch(BytesIO(data), max_memory=10) as prefetch:
+        fp = prefetch.result()
+        assert fp._rolled
+        validate_archive(fp)
+
+    class BrokenStream(BytesIO):
+        def read(self, *args):
+            raise OSError("Storage unavailable")
+
+    with Prefetch(BrokenStream()) as prefetch:
+        with pytest.raises(OSError):
+            prefetch.result()
+
+    class HungStream(BytesIO):
+        def __init__(self):
+            super().__init__()
+            self.release = threading.Event()
+
+        def read(self, *args):
+            self.release.wait()
+            return b""
+
+    # A hung storage read does not block the caller
+    src = HungStream()
+    with Prefetch(src) as prefetch:
+        with pytest.raises(TimeoutError):
+            prefetch.result(timeout=0.01)
+    src.release.set()
+    prefetch._thread.join()
+    assert prefetch.buffer.closed
@@ -0,0 +1,57 @@
+# SPDX-FileCopyrightText: 2026 CERN.
+# SPDX-License-Identifier: MIT
+"""Test invenio-swh client."""
+
+import tempfile
+from io import BytesIO
+from types import SimpleNamespace
+
+from invenio_swh.client import SWHCLient
+
+
+def test_open_payload():
+    """Test that local files are memory-mapped and other buffers are read."""
+    client = SWHCLient(None, "https://deposit.example.org/1/test/")
+
+    with client._open_payload(BytesIO(b"archive")) as payload:
+        assert payload == b"archive"
+
+    with tempfile.TemporaryFile() as fp:
+        fp.write(b"archive")
+        fp.flush()
+        with client._open_payload(fp) as payload:
+            assert isinstance(payload, memoryview)
+            assert payload.tobytes() == b"archive"
+
+
+class FakeResponse(dict):
+    """Response of the fake connection."""
+
+    def __init__(self, status, **headers):
+        """Initialise the response."""
+        super().__init__(**headers)
+        self.status = status
+
+
+def test_deposit_status_cache(app, cache, monkeypatch):
+    """Test that deposit statuses are cached and fetched with conditional requests."""
+    requests = []
+
+    def _request(uri, method, headers=None, payload=None):
+        requests.append(headers)
+        if headers.get("If-None-Match") == "v1":
+            return FakeResponse(304), b""
+        return FakeResponse(200, etag="v1"), {"deposit_status": "loading"}
+
+    connection = SimpleNamespace(h=SimpleNamespace(request=_request))
+    client = SWHCLient(connection, "https://deposit.example.org/1/test/")
+
+    assert client.get_deposit_status(1) == {"deposit_status": "loading"}
+    # Within the TTL, no request is sent
+    assert client.get_deposit_status(1) == {"deposit_status": "loading"}
+    assert len(requests) == 1
+
+    # Afterwards, a conditional request is sent
+    monkeypatch.setitem(app.config, "SWH_STATUS_CACHE_TTL", 0)
+    assert client.get_deposit_status(1) == {"deposit_status": "loading"}
+    assert requests[-1] == {"If-None-Match": "v1"}
@@ -1,3 +1,75 @@
 # SPDX-FileCopyrightText: 2023 CERN.
 # SPDX-License-Identifier: MIT
 """Test invenio-swh controller integration."""
+
+from unittest.mock import MagicMock
+
+import pytest
+
+from invenio_swh.controller import CircuitBreaker, RateBudget
+from invenio_swh.controller.budget import parse_rate_limit
+from invenio_swh.errors import CircuitOpen, ClientException, RateBudgetExceeded
+
+
+def test_circuit_breaker(app, cache, monkeypatch):
+    """Test that the circuit opens after consecutive failures and is probed later."""
+    monkeypatch.setitem(app.config, "SWH_CIRCUIT_BREAKER_THRESHOLD", 2)
+    breaker = CircuitBreaker(name="test")
+    calls = []
+
+    def _request(status=None):
+        calls.append(status)
+        if status:
+            raise ClientException("Request failed", status=status)
+        return "ok"
+
+    # Client errors don't open the circuit
+    for _ in range(3):
+        with pytest.raises(ClientException):
+            breaker.call(_request, status=400)
+    assert not breaker.is_open()
+
+    for _ in range(2):
+        with pytest.raises(ClientException):
+            breaker.call(_request, status=503)
+    assert breaker.is_open()
+
+    # Requests are rejected without reaching the remote
+    with pytest.raises(CircuitOpen):
+        breaker.call(_request)
+    assert len(calls) == 5
+
+    # Once the timeout is over, a probe closes the circuit
+    monkeypatch.setitem(app.config, "SWH_CIRCUIT_BREAKER_TIMEOUT", 0)
+    assert breaker.call(_request) == "ok"
+    assert not breaker.is_open()
+
+    # A closed circuit without failures is not reset after each success
+    delete_many = MagicMock()
+    monkeypatch.setattr(
+        "invenio_swh.controller.breaker.current_cache.delete_many", delete_many
+    )
+    assert breaker.call(_request) == "ok"
+    delete_many.assert_not_called()
+
+
+def test_rate_budget(app, cache):
+    """Test that requests over the budget of a collection are rejected."""
+    budget = RateBudget("test", limit=2, period=3600)
+    budget.acquire()
+    budget.acquire()
+    with pytest.raises(RateBudgetExceeded) as exc:
+        budget.acquire()
+    # Tasks defer rejected requests like when the circuit is open
+    assert isinstance(exc.value, CircuitOpen)
+    assert 0 < exc.value.retry_after <= 3601
+
+    # Budgets are independent
+    RateBudget("other", limit=2, period=3600).acquire()
+
+
+def test_parse_rate_limit():
+    """Test the parsing of the rate limits of the collections."""
+    assert parse_rate_limit("20/m") == (20, 60)
+    assert parse_rate_limit("1000/d") == (1000, 24 * 60 * 60)
+    assert parse_rate_limit(60) == (60, 60)
@@ -4,6 +4,10 @@
 
 """Module tests."""
 
+import subprocess
+import sys
+from unittest.mock import patch
+
 from flask import Flask
 
 from invenio_swh import InvenioSWH
@@ -29,10 +33,26 @@ def test_init():
             "SWH_ENABLED": "test",
         }
     )
-    ext = InvenioSWH(app)
-    assert "invenio-swh" in app.extensions
+    with patch("sword2.Connection") as connection:
+        ext = InvenioSWH(app)
+        assert "invenio-swh" in app.extensions
+        # The service is only initialized on first use
+        connection.assert_not_called()
+        with app.app_context():
+            assert ext.service is ext.service
+        connection.assert_called_once()
 
     # Extension not configured, therefore not initialized.
     app = Flask("testapp")
     ext = InvenioSWH(app)
     assert "invenio-swh" not in app.extensions
+
+
+def test_lazy_imports():
+    """Test that the client dependencies are not imported with the extension."""
+    code = (
+        "import sys, invenio_swh, invenio_swh.tasks;"
+        "print('sword2' in sys.modules or 'invenio_swh.client' in sys.modules)"
+    )
+    output = subprocess.check_output([sys.executable, "-c", code], text=True)
+    assert output.strip() == "False"
@@ -0,0 +1,27 @@
+# SPDX-FileCopyrightText: 2026 CERN.
+# SPDX-License-Identifier: MIT
+"""Test the adaptive polling of deposits."""
+
+from invenio_swh.polling import PollingPolicy
+
+MiB = 1024 * 1024
+
+
+def test_polling_policy(app, cache):
+    """Test that polls are scheduled from the learned time to completion."""
+    policy = PollingPolicy()
+
+    # Without history, polls back off exponentially
+    assert policy.next_countdown(MiB, "deposited", {}, now=0) == 60
+    assert policy.next_countdown(MiB, "deposited", {}, now=0, retries=2) == 240
+    assert policy.next_countdown(MiB, "deposited", {}, now=0, retries=10) == 600
+
+    policy.observe(MiB, {"deposited": 0, "loading": 200}, done_at=300)
+    assert policy.next_countdown(MiB, "deposited", {"deposited": 0}, now=0) == 300
+    assert policy.next_countdown(MiB, "loading", {"loading": 0}, now=0) == 100
+    # Archives of other sizes have no history yet
+    assert policy.next_countdown(100 * MiB, "loading", {}, now=0) == 60
+
+    # The time to completion is smoothed over deposits
+    policy.observe(MiB, {"loading": 0}, done_at=600)
+    assert policy.expected_remaining(MiB, "loading") == 0.2 * 600 + 0.8 * 100
@@ -0,0 +1,44 @@
+# SPDX-FileCopyrightText: 2026 CERN.
+# SPDX-License-Identifier: MIT
+"""Test the scheduling of the deposit workflow stages."""
+
+from datetime import datetime, timedelta
+
+from invenio_swh.scheduler import stage_options
+
+MiB = 1024 * 1024
+
+
+def test_stage_options(app, monkeypatch):
+    """Test the routing of the workflow stages to their queues."""
+    assert stage_options("upload") == {}
+
+    monkeypatch.setitem(app.config["SWH_TASK_QUEUES"], "upload", "swh-upload")
+    assert stage_options("upload") == {"queue": "swh-upload"}
+    assert stage_options("complete") == {}
+
+
+def test_stage_options_lanes(app, monkeypatch):
+    """Test that large archives are scheduled in their own lane with lower priority."""
+    monkeypatch.setitem(app.config["SWH_TASK_QUEUES"], "upload", "swh-upload")
+    monkeypatch.setitem(app.config["SWH_TASK_QUEUES"], "upload_large", "swh-large")
+
+    small = stage_options("upload", size=MiB)
+    large = stage_options("upload", size=100 * MiB)
+    assert small["queue"] == "swh-upload"
+    assert large["queue"] == "swh-large"
+    assert small["priority"] > large["priority"]
+
+    # Failed attempts make a deposit more expensive
+    retried = stage_options("upload", size=MiB, retries=3)
+    assert retried["priority"] < small["priority"]
+
+
+def test_stage_options_aging(app):
+    """Test that pending deposits keep their weight for a while and then age."""
+    now = datetime.utcnow()
+    fresh = stage_options("upload", size=50 * MiB, created=now)
+    waiting = stage_options("upload", size=50 * MiB, created=now - timedelta(minutes=1))
+    old = stage_options("upload", size=50 * MiB, created=now - timedelta(hours=1))
+    assert fresh["priority"] == waiting["priority"]
+    assert old["priority"] > fresh["priority"]
@@ -2,10 +2,34 @@
 # SPDX-License-Identifier: MIT
 """Test swh service module."""
 
+from datetime import datetime, timedelta
+from enum import Enum
+from io import BytesIO
+from unittest.mock import MagicMock
+
 import pytest
+from invenio_db import db
+from invenio_rdm_records.proxies import current_rdm_records_service as record_service
+from invenio_records_resources.services.uow import UnitOfWork
+from sqlalchemy import event
 
-from invenio_swh.errors import InvalidRecord
-from invenio_swh.models import SWHDepositModel, SWHDepositStatus
+from invenio_swh.errors import (
+    ClientException,
+    DepositAlreadyCreated,
+    DepositArchived,
+    DepositLocked,
+    DepositUploadIncomplete,
+    InvalidArchive,
+    InvalidRecord,
+)
+from invenio_swh.locks import RecordLock
+from invenio_swh.models import (
+    SWHDepositArchiveModel,
+    SWHDepositEventModel,
+    SWHDepositModel,
+    SWHDepositStatus,
+    SWHRemoteDepositStatus,
+)
 from invenio_swh.proxies import current_swh_service as service
 
 
@@ -66,6 +90,107 @@ def test_deposit_creation_failure(app, minimal_record, zip_file, create_record_f
     assert SWHDepositModel.query.count() == 0
 
 
+def test_deposit_invalid_archive(
+    app, minimal_record, create_record_factory, monkeypatch
+):
+    """Test that corrupt archives are rejected before the deposit is created."""
+    create_deposit = MagicMock()
+    monkeypatch.setattr(service.controller, "create_deposit", create_deposit)
+    corrupt = BytesIO(b"PK\x03\x04 not a zip file")
+    record = create_record_factory(minimal_record, files=[("test.zip", corrupt)])
+    with pytest.raises(InvalidArchive):
+        service.create(record._record)
+
+    create_deposit.assert_not_called()
+    assert SWHDepositModel.query.count() == 0
+
+
+def test_create_idempotent(
+    app, minimal_record, zip_file, create_record_factory, monkeypatch
+):
+    """Test that retried or concurrent creations do not create duplicate deposits."""
+    record = create_record_factory(minimal_record, files=[("test.zip", zip_file)])
+
+    def _raise(*args, **kwargs):
+        raise ClientException("Timeout")
+
+    # The deposit is persisted before the remote call, and stays "NEW" if it fails
+    with monkeypatch.context() as m:
+        m.setattr(service.controller, "create_deposit", _raise)
+        with pytest.raises(ClientException):
+            service.create(record._record)
+    model = SWHDepositModel.query.filter_by(object_uuid=record._record.id).one()
+    assert model.status == SWHDepositStatus.NEW
+
+    # Concurrent creations are rejected
+    lock = RecordLock(record._record.id)
+    assert lock.acquire()
+    with pytest.raises(DepositLocked):
+        service.create(record._record)
+    lock.release()
+
+    # The creation is retried, then rejected once the deposit was created
+    swh_deposit = service.create(record._record)
+    assert swh_deposit.status == SWHDepositStatus.CREATED
+    with pytest.raises(DepositAlreadyCreated):
+        service.create(record._record)
+    assert SWHDepositModel.query.count() == 1
+
+
+def test_metadata_only_deposit(
+    app, minimal_record, zip_file, create_record_factory, identity_simple, monkeypatch
+):
+    """Test that new versions with an unchanged archive only deposit their metadata."""
+    record = create_record_factory(minimal_record, files=[("test.zip", zip_file)])
+    swh_deposit = service.create(record._record)
+    service.update_swhid(swh_deposit, "swh:1:dir:1234")
+
+    # New version with the same archive
+    draft = record_service.new_version(identity_simple, record.id)
+    record_service.import_files(identity_simple, draft.id)
+    data = draft.data
+    data["metadata"]["publication_date"] = "2024-01-01"
+    record_service.update_draft(identity_simple, draft.id, data)
+    new_record = record_service.publish(identity_simple, draft.id)
+
+    new_deposit = service.create(new_record._record)
+    # The deposit is only archived once Software Heritage accepts it
+    assert new_deposit.status == SWHDepositStatus.WAITING
+    assert new_deposit.swhid is None
+    assert new_deposit.referenced_swhid == "swh:1:dir:1234"
+    assert new_deposit.id is not None
+
+    # The referenced SWHID is stored, it does not depend on the configuration anymore
+    monkeypatch.setitem(app.config, "SWH_METADATA_ONLY_DEPOSITS", False)
+    fetch_deposit_status = MagicMock(return_value={"deposit_status": "done"})
+    monkeypatch.setattr(
+        service.controller, "fetch_deposit_status", fetch_deposit_status
+    )
+    new_deposit = service.sync_status(new_deposit).deposit
+    assert new_deposit.status == SWHDepositStatus.SUCCESS
+    assert new_deposit.swhid == "swh:1:dir:1234"
+
+
+def test_collection_routing(
+    app, minimal_record, zip_file, create_record_factory, monkeypatch
+):
+    """Test that deposits are routed to the collection of their record."""
+    tenant_controller = MagicMock(wraps=service.controller)
+    monkeypatch.setattr(service, "controllers", {"software": tenant_controller})
+    monkeypatch.setitem(app.config, "SWH_COLLECTION_ROUTES", {"software": "software"})
+
+    record = create_record_factory(minimal_record, files=[("test.zip", zip_file)])
+    swh_deposit = service.create(record._record)
+    assert swh_deposit.collection == "software"
+    assert service.get_controller(swh_deposit) is tenant_controller
+
+    service.upload_files(swh_deposit, record._record.files)
+    service.complete(swh_deposit)
+    assert tenant_controller.create_deposit.called
+    assert tenant_controller.update_deposit_files.called
+    assert tenant_controller.complete_deposit.called
+
+
 def test_upload_files_failure(
     app, minimal_record, zip_file, create_record_factory, monkeypatch
 ):
@@ -120,3 +245,254 @@ def test_deposit_completion_failure(
     service.complete(swh_deposit.id)
     assert swh_deposit.status == SWHDepositStatus.FAILED
     assert swh_deposit.swhid is None
+
+
+def test_search_candidates(app, minimal_record, zip_file, create_record_factory):
+    """Test the search pre-filter of records eligible for Software Heritage."""
+    record = create_record_factory(minimal_record, files=[("test.zip", zip_file)])
+    # Not a software record
+    minimal_record["metadata"]["resource_type"]["id"] = "dataset"
+    create_record_factory(minimal_record, files=[("test.zip", zip_file)])
+    record._record.index.refresh()
+
+    assert list(service.search_candidates()) == [record.id]
+
+
+def test_upload_files_interrupted(
+    app, minimal_record, zip_file, create_record_factory, monkeypatch
+):
+    """Test that a transient failure during the upload does not fail the deposit."""
+
+    def _raise(*args, **kwargs):
+        raise ClientException("Service unavailable", status=503)
+
+    record = create_record_factory(minimal_record, files=[("test.zip", zip_file)])
+    swh_deposit = service.create(record._record)
+
+    monkeypatch.setattr(
+        "invenio_swh.controller.SWHController.update_deposit_files", _raise
+    )
+    with pytest.raises(DepositUploadIncomplete):
+        service.upload_files(swh_deposit.id, record._record.files)
+
+    deposit = service.read(swh_deposit.id).deposit
+    assert deposit.status == SWHDepositStatus.CREATED
+    assert deposit.uploaded_parts == 0
+
+
+def test_upload_files_spool(
+    app, minimal_record, zip_file, create_record_factory, monkeypatch, tmp_path
+):
+    """Test that retried uploads read the archive from the spool."""
+    monkeypatch.setitem(app.config, "SWH_SPOOL_DIR", str(tmp_path))
+    record = create_record_factory(minimal_record, files=[("test.zip", zip_file)])
+    swh_deposit = service.create(record._record)
+    # The archive was copied to the spool when it was validated
+    assert len(list(tmp_path.iterdir())) == 1
+
+    get_stream = MagicMock()
+    monkeypatch.setattr(
+        "invenio_records_resources.records.api.FileRecord.get_stream", get_stream
+    )
+    service.upload_files(swh_deposit.id, record._record.files)
+    get_stream.assert_not_called()
+    assert swh_deposit.status == SWHDepositStatus.CREATED
+
+
+def test_create_prefetch_spool(
+    app, minimal_record, zip_file, create_record_factory, monkeypatch, tmp_path
+):
+    """Test that unvalidated archives are spooled while the deposit is created."""
+    monkeypatch.setitem(app.config, "SWH_SPOOL_DIR", str(tmp_path))
+    monkeypatch.setitem(app.config, "SWH_VALIDATE_ARCHIVES", False)
+    record = create_record_factory(minimal_record, files=[("test.zip", zip_file)])
+    swh_deposit = service.create(record._record)
+    assert swh_deposit.status == SWHDepositStatus.CREATED
+    assert len(list(tmp_path.iterdir())) == 1
+
+
+def test_sync_remote_status(app, minimal_record, zip_file, create_record_factory):
+    """Test that the detailed status reported by Software Heritage is stored."""
+    record = create_record_factory(minimal_record, files=[("test.zip", zip_file)])
+    swh_deposit = service.create(record._record)
+    service.upload_files(swh_deposit.id, record._record.files)
+    service.complete(swh_deposit.id)
+
+    deposit = service.sync_status(swh_deposit.id).deposit
+    assert deposit.remote_status == SWHRemoteDepositStatus.LOADING
+
+    res = list(service.search_by_remote_status(["verified", "loading"]))
+    assert [r.deposit.id for r in res] == [swh_deposit.id]
+    assert list(service.search_by_remote_status(["verified"])) == []
+
+
+def test_sync_status_loaded_deposit(
+    app, minimal_record, zip_file, create_record_factory
+):
+    """Test that syncing an already loaded deposit does not read it again."""
+    record = create_record_factory(minimal_record, files=[("test.zip", zip_file)])
+    swh_deposit = service.create(record._record)
+    service.upload_files(swh_deposit, record._record.files)
+    service.complete(swh_deposit)
+
+    statements = []
+
+    def count_selects(conn, cursor, statement, *args):
+        if statement.startswith("SELECT") and "FROM swh_deposit " in statement:
+            statements.append(statement)
+
+    event.listen(db.engine, "before_cursor_execute", count_selects)
+    try:
+        deposit = service.sync_status(swh_deposit).deposit
+    finally:
+        event.remove(db.engine, "before_cursor_execute", count_selects)
+    assert deposit is swh_deposit
+    assert deposit.remote_status == SWHRemoteDepositStatus.LOADING
+    assert statements == []
+
+
+def test_deposit_history(app, minimal_record, zip_file, create_record_factory):
+    """Test that status transitions are recorded and their latencies computed."""
+    record = create_record_factory(minimal_record, files=[("test.zip", zip_file)])
+    swh_deposit = service.create(record._record)
+    service.upload_files(swh_deposit.id, record._record.files)
+    service.complete(swh_deposit.id)
+
+    events = SWHDepositEventModel.query.filter_by(object_uuid=record._record.id)
+    statuses = [e.status for e in events.order_by(SWHDepositEventModel.created)]
+    assert statuses == [SWHDepositStatus.CREATED, SWHDepositStatus.WAITING]
+
+    latencies = service.get_stage_latencies()
+    assert latencies["CREATED->WAITING"]["count"] == 1
+    assert latencies["CREATED->WAITING"]["p50"] >= 0
+
+    # Transitions are committed in the same transaction as the deposit
+    with UnitOfWork() as uow:
+        service.update_status(swh_deposit, SWHDepositStatus.FAILED, uow=uow)
+        uow.rollback()
+    assert events.count() == 2
+
+
+def test_bulk_update_status(app, minimal_record, zip_file, create_record_factory):
+    """Test that the status of many deposits is updated in a single statement."""
+    deposits = []
+    for _ in range(2):
+        record = create_record_factory(minimal_record, files=[("test.zip", zip_file)])
+        swh_deposit = service.create(record._record)
+        service.upload_files(swh_deposit.id, record._record.files)
+        service.complete(swh_deposit.id)
+        deposits.append(service.read(swh_deposit.id).deposit)
+    version_id = deposits[0].model.version_id
+
+    done, failed = deposits
+    changes = [
+        (done.id, version_id, "done", None, "swh:1:dir:1234"),
+        (failed.id, failed.model.version_id, SWHDepositStatus.FAILED, None, None),
+    ]
+    assert service.bulk_update_status(changes) == 2
+    # Changes computed from an outdated version of the deposits are not applied
+    assert service.bulk_update_status(changes) == 0
+
+    done = service.read(done.id).deposit
+    assert done.status == SWHDepositStatus.SUCCESS
+    assert done.swhid == "swh:1:dir:1234"
+    assert done.remote_status == SWHRemoteDepositStatus.DONE
+    assert done.model.version_id == version_id + 1
+    assert service.read(failed.id).deposit.status == SWHDepositStatus.FAILED
+
+    events = SWHDepositEventModel.query.filter_by(
+        object_uuid=done.record_id, status=SWHDepositStatus.SUCCESS
+    )
+    assert events.count() == 1
+
+
+def test_bulk_update_remote_status(
+    app, minimal_record, zip_file, create_record_factory
+):
+    """Test that remote statuses are stored when the internal status is unchanged."""
+    record = create_record_factory(minimal_record, files=[("test.zip", zip_file)])
+    swh_deposit = service.create(record._record)
+    service.upload_files(swh_deposit.id, record._record.files)
+    service.complete(swh_deposit.id)
+    deposit = service.read(swh_deposit.id).deposit
+    assert deposit.status == SWHDepositStatus.WAITING
+    version_id = deposit.model.version_id
+
+    changes = [(deposit.id, version_id, "loading", "Loading the archive", None)]
+    assert service.bulk_update_status(changes) == 1
+
+    model = db.session.get(SWHDepositModel, record._record.id)
+    db.session.refresh(model)
+    assert model.status == SWHDepositStatus.WAITING
+    assert model.remote_status == SWHRemoteDepositStatus.LOADING
+    assert model.remote_status_detail == "Loading the archive"
+    assert [d.id for d in service.search_by_remote_status(["loading"])] == [deposit.id]
+    # Only status transitions are recorded in the history
+    events = SWHDepositEventModel.query.filter_by(object_uuid=record._record.id)
+    assert events.count() == 2
+
+    # Unchanged deposits are not written again
+    changes = [(deposit.id, version_id + 1, "loading", "Loading the archive", None)]
+    assert service.bulk_update_status(changes) == 0
+    db.session.refresh(model)
+    assert model.version_id == version_id + 1
+
+    # A concurrent update (e.g. a deposit manually marked as failed) is not overwritten
+    service.update_status(deposit, SWHDepositStatus.FAILED)
+    changes = [(deposit.id, version_id + 1, "done", None, "swh:1:dir:1234")]
+    assert service.bulk_update_status(changes) == 0
+    assert service.read(deposit.id).deposit.status == SWHDepositStatus.FAILED
+
+
+def test_archive_deposits(app, minimal_record, zip_file, create_record_factory):
+    """Test that old terminal deposits are moved to the archive table."""
+    records = [
+        create_record_factory(minimal_record, files=[("test.zip", zip_file)])
+        for _ in range(2)
+    ]
+    done = service.create(records[0]._record)
+    service.update_swhid(done, "swh:1:dir:1234")
+    pending = service.create(records[1]._record)
+
+    # Pending deposits are not archived
+    older_than = datetime.utcnow() + timedelta(days=1)
+    assert service.archive_deposits(older_than) == 1
+    assert service.archive_deposits(older_than) == 0
+    assert SWHDepositModel.query.count() == 1
+    assert SWHDepositArchiveModel.query.count() == 1
+
+    # Archived deposits can still be looked up
+    deposit = service.get_record_deposit(records[0]._record.id).deposit
+    assert deposit.status == SWHDepositStatus.SUCCESS
+    assert deposit.swhid == "swh:1:dir:1234"
+    assert deposit.id == done.id
+    assert deposit.model.version_id is not None
+    res = service.get_record_deposits([r._record.id for r in records])
+    assert {r.deposit.swhid for r in res} == {"swh:1:dir:1234", None}
+
+    # Archived deposits are read-only
+    with pytest.raises(DepositArchived):
+        deposit.commit()
+    assert SWHDepositModel.query.count() == 1
+
+
+def test_pending_deposits_index(app, db):
+    """Test that the sweep of pending deposits uses the partial index."""
+    if db.engine.name != "postgresql":
+        pytest.skip("Partial indexes are only created on PostgreSQL.")
+
+    query = service.record_cls.query_by_status(
+        [SWHDepositStatus.WAITING], updated_before=datetime.utcnow()
+    )
+    compiled = query.statement.compile(
+        db.engine, compile_kwargs={"render_postcompile": True}
+    )
+    params = {
+        key: value.value if isinstance(value, Enum) else value
+        for key, value in compiled.params.items()
+    }
+    connection = db.session.connection()
+    # The table is small in tests, force the planner to consider the indexes
+    connection.exec_driver_sql("SET LOCAL enable_seqscan = off")
+    plan = connection.exec_driver_sql(f"EXPLAIN {compiled}", params).scalars().all()
+    assert "ix_swh_deposit_pending_updated" in "\n".join(plan)
@@ -0,0 +1,57 @@
+# SPDX-FileCopyrightText: 2026 CERN.
+# SPDX-License-Identifier: MIT
+"""Test the local spool of archives."""
+
+import hashlib
+import os
+from io import BytesIO
+
+from invenio_swh.spool import ArchiveSpool
+
+
+def _checksum(data):
+    return f"md5:{hashlib.md5(data).hexdigest()}"
+
+
+def test_spool_put_get(tmp_path):
+    """Test that spooled archives are read back by checksum."""
+    spool = ArchiveSpool(tmp_path / "spool", max_size=100)
+    checksum = _checksum(b"archive")
+    assert spool.get(checksum) is None
+
+    with spool.put(checksum, BytesIO(b"archive")) as fp:
+        assert fp.read() == b"archive"
+    with spool.get(checksum) as fp:
+        assert fp.read() == b"archive"
+
+    # Archives bigger than the spool are not copied
+    big = b"0" * 101
+    assert spool.put(_checksum(big), BytesIO(big), size=101) is None
+    assert spool.get(_checksum(big)) is None
+    assert not list((tmp_path / "spool").glob("*.tmp"))
+
+    # Truncated or corrupt copies are discarded
+    checksum = _checksum(b"other archive")
+    assert spool.put(checksum, BytesIO(b"other")) is None
+    assert spool.get(checksum) is None
+    assert not list((tmp_path / "spool").glob("*.tmp"))
+
+
+def test_spool_eviction(tmp_path):
+    """Test that the least recently used archives are evicted first."""
+    spool = ArchiveSpool(tmp_path, max_size=20)
+    archives = {name: name.encode() * 10 for name in "abc"}
+    checksums = {name: _checksum(data) for name, data in archives.items()}
+    for i, name in enumerate("ab"):
+        spool.put(checksums[name], BytesIO(archives[name])).close()
+        os.utime(spool._path(checksums[name]), (i, i))
+
+    # Reading "a" makes "b" the least recently used copy
+    spool.get(checksums["a"]).close()
+    spool.put(checksums["c"], BytesIO(archives["c"])).close()
+
+    assert spool.get(checksums["b"]) is None
+    for name in "ac":
+        fp = spool.get(checksums[name])
+        assert fp is not None
+        fp.close()
@@ -2,6 +2,20 @@
 # SPDX-License-Identifier: MIT
 """Test invenio-swh tasks."""
 
+from unittest.mock import MagicMock
+
+from invenio_cache import current_cache
+from invenio_db import db
+
+from invenio_swh.api import SWHDeposit
+from invenio_swh.models import (
+    SWHDepositModel,
+    SWHDepositStatus,
+    SWHRemoteDepositStatus,
+)
+from invenio_swh.proxies import current_swh_service as service
+from invenio_swh.tasks import complete_deposit, poll_deposits
+
 
 def test_publish(app):
     """Test publish."""
@@ -11,3 +25,65 @@ def test_publish(app):
 def test_polling_status(app):
     """Test polling mechanism for status."""
     assert True
+
+
+def test_poll_deposits(
+    app, cache, minimal_record, zip_file, create_record_factory, monkeypatch
+):
+    """Test that batched polls coalesce duplicate deposits and re-schedule them."""
+    record = create_record_factory(minimal_record, files=[("test.zip", zip_file)])
+    deposit = service.create(record._record)
+    service.upload_files(deposit, record._record.files)
+    service.complete(deposit)
+    assert deposit.status == SWHDepositStatus.WAITING
+
+    fetch_status_change = MagicMock(
+        return_value=(deposit.id, deposit.model.version_id, "loading", None, None)
+    )
+    monkeypatch.setattr(service, "fetch_status_change", fetch_status_change)
+    apply_async = MagicMock()
+    monkeypatch.setattr(poll_deposits, "apply_async", apply_async)
+
+    poll_deposits([deposit.id, deposit.id, "unknown"])
+    fetch_status_change.assert_called_once()
+    # The remote status is stored, although the deposit is still waiting
+    model = db.session.get(SWHDepositModel, deposit.record_id)
+    db.session.refresh(model)
+    assert model.status == SWHDepositStatus.WAITING
+    assert model.remote_status == SWHRemoteDepositStatus.LOADING
+    # The deposit is still loading, it is polled again in a new batch
+    apply_async.assert_called_once()
+    args, kwargs = apply_async.call_args
+    assert args == ([deposit.id],)
+    assert kwargs["countdown"] >= app.config["SWH_POLL_MIN_INTERVAL"]
+    state = kwargs["kwargs"]["state"][deposit.id]
+    assert list(state["seen"]) == ["loading"]
+    assert state["retries"] == 1
+
+    # Re-scheduled polls reuse the state, without loading the record files again
+    archive_size = MagicMock()
+    monkeypatch.setattr(SWHDeposit, "archive_size", property(archive_size))
+    poll_deposits(*args, **kwargs["kwargs"])
+    assert fetch_status_change.call_count == 2
+    archive_size.assert_not_called()
+
+    # Polls of a deposit being polled concurrently are dropped
+    current_cache.add(f"invenio-swh:poll:{deposit.id}", 0)
+    poll_deposits([deposit.id])
+    assert fetch_status_change.call_count == 2
+
+
+def test_complete_deposit_schedules_polls(
+    app, minimal_record, zip_file, create_record_factory, monkeypatch
+):
+    """Test that completed deposits are polled in batches."""
+    record = create_record_factory(minimal_record, files=[("test.zip", zip_file)])
+    deposit = service.create(record._record)
+    service.upload_files(deposit, record._record.files)
+    apply_async = MagicMock()
+    monkeypatch.setattr(poll_deposits, "apply_async", apply_async)
+
+    complete_deposit(str(deposit.id))
+    apply_async.assert_called_once()
+    args, _ = apply_async.call_args
+    assert args == ([str(deposit.id)],)
@@ -0,0 +1,98 @@
+# SPDX-FileCopyrightText: 2026 CERN.
+# SPDX-License-Identifier: MIT
+"""Test the tracing of the deposit pipeline."""
+
+from contextlib import contextmanager
+from types import SimpleNamespace
+from unittest.mock import MagicMock
+
+import pytest
+from flask import Flask
+
+from invenio_swh.tracing import TracedUnitOfWork, span, traced
+
+
+@pytest.fixture()
+def tracing_app():
+    """Application with tracing enabled, recording the spans."""
+    spans = []
+    app = Flask("testapp")
+    app.config.update(
+        SWH_TRACING_ENABLED=True,
+        SWH_TRACING_SAMPLE_RATE=1.0,
+        SWH_TRACING_HOOKS=[lambda *args: spans.append(args)],
+    )
+    with app.app_context():
+        yield app, spans
+
+
+def test_spans(tracing_app):
+    """Test that nested spans are passed to the hooks once finished."""
+    app, spans = tracing_app
+
+    @traced("outer")
+    def outer():
+        with span("inner", deposit_id="1"):
+            pass
+        raise ValueError("failed")
+
+    with pytest.raises(ValueError):
+        outer()
+    assert [s[0] for s in spans] == ["inner", "outer"]
+    assert spans[0][2] == {"deposit_id": "1"}
+    assert spans[1][1] >= spans[0][1]
+    assert isinstance(spans[1][3], ValueError)
+
+
+def test_sampling(tracing_app):
+    """Test that child spans follow the sampling decision of their root span."""
+    app, spans = tracing_app
+    app.config["SWH_TRACING_SAMPLE_RATE"] = 0
+    with span("outer"):
+        app.config["SWH_TRACING_SAMPLE_RATE"] = 1.0
+        with span("inner"):
+            pass
+    assert spans == []
+
+    app.config["SWH_TRACING_ENABLED"] = False
+    with span("outer"):
+        pass
+    assert spans == []
+
+
+def test_opentelemetry_spans(tracing_app, monkeypatch):
+    """Test that spans are also recorded as OpenTelemetry spans."""
+    app, spans = tracing_app
+    otel_spans = []
+
+    class FakeTracer:
+        @contextmanager
+        def start_as_current_span(self, name, attributes=None):
+            otel_spans.append([name, attributes, None])
+            try:
+                yield
+            except Exception as exc:
+                otel_spans[-1][2] = exc
+                raise
+
+    fake_trace = SimpleNamespace(get_tracer=lambda name: FakeTracer())
+    monkeypatch.setattr("invenio_swh.tracing.trace", fake_trace)
+
+    with span("ok", deposit_id="1"):
+        pass
+    with pytest.raises(ValueError):
+        with span("failed"):
+            raise ValueError("failed")
+
+    assert otel_spans[0] == ["ok", {"deposit_id": "1"}, None]
+    assert otel_spans[1][0] == "failed"
+    assert isinstance(otel_spans[1][2], ValueError)
+    assert [s[0] for s in spans] == ["ok", "failed"]
+
+
+def test_traced_unit_of_work(tracing_app):
+    """Test that the commit of a unit of work is traced in its own span."""
+    app, spans = tracing_app
+    uow = TracedUnitOfWork(session=MagicMock())
+    uow.commit()
+    assert [s[0] for s in spans] == ["db.commit"]
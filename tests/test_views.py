@@ -0,0 +1,85 @@
+# SPDX-FileCopyrightText: 2026 CERN.
+# SPDX-License-Identifier: MIT
+"""Test invenio-swh views."""
+
+from invenio_access.permissions import system_identity
+from invenio_db import db
+
+from invenio_swh.proxies import current_swh_service as service
+
+
+def test_get_deposits(app, client, minimal_record, zip_file, create_record_factory):
+    """Test the batched read of deposit statuses."""
+    records = [
+        create_record_factory(minimal_record, files=[("test.zip", zip_file)])
+        for _ in range(2)
+    ]
+    deposit = service.create(records[0]._record)
+
+    res = service.get_record_deposits([r._record.id for r in records])
+    assert [r.deposit.id for r in res] == [deposit.id]
+
+    url = "/swh/deposits"
+    pid = records[0]._record.pid.pid_value
+    query = [("record_id", r._record.pid.pid_value) for r in records]
+    res = client.get(url, query_string=query)
+    assert res.status_code == 200
+    assert res.json["hits"] == [{"record_id": pid, "status": "created", "swhid": None}]
+    assert res.headers["Cache-Control"] == "public, max-age=60"
+
+    etag = res.headers["ETag"]
+    res = client.get(url, query_string=query, headers={"If-None-Match": etag})
+    assert res.status_code == 304
+
+    # Internal record ids are accepted as well
+    res = client.get(url, query_string={"record_id": str(records[0]._record.id)})
+    assert [hit["swhid"] for hit in res.json["hits"]] == [None]
+
+    assert client.get(url).status_code == 400
+    res = client.get(url, query_string={"record_id": "foo"})
+    assert res.status_code == 200
+    assert res.json["hits"] == []
+
+
+def test_get_deposit_badge(
+    app, client, minimal_record, zip_file, create_record_factory
+):
+    """Test the status and badge of a single deposit."""
+    record = create_record_factory(minimal_record, files=[("test.zip", zip_file)])
+    url = f"/swh/deposits/{record._record.pid.pid_value}"
+    assert client.get(url).status_code == 404
+    assert client.get("/swh/deposits/foo").status_code == 404
+
+    deposit = service.create(record._record)
+    service.update_swhid(deposit, "swh:1:dir:1234")
+
+    res = client.get(url)
+    assert res.status_code == 200
+    assert res.json["record_id"] == record._record.pid.pid_value
+    assert res.json["status"] == "success"
+    assert res.json["badge"]["message"] == "archived"
+    assert (
+        res.json["badge"]["link"] == "https://webapp.staging.swh.network/swh:1:dir:1234"
+    )
+    assert res.headers["Cache-Control"] == "public, max-age=86400"
+
+    etag = res.headers["ETag"]
+    assert not etag.startswith("W/")
+    assert client.get(url, headers={"If-None-Match": etag}).status_code == 304
+
+
+def test_get_deposit_restricted(
+    app, client, minimal_record, zip_file, create_record_factory
+):
+    """Test that the deposits of records the requester cannot read are hidden."""
+    record = create_record_factory(minimal_record, files=[("test.zip", zip_file)])
+    service.create(record._record)
+    record._record.access.protection.set("restricted", files="restricted")
+    record._record.commit()
+    db.session.commit()
+
+    pid = record._record.pid.pid_value
+    assert client.get(f"/swh/deposits/{pid}").status_code == 404
+    res = client.get("/swh/deposits", query_string={"record_id": pid})
+    assert res.json["hits"] == []
+    assert service.filter_readable_records(system_identity, [record._record.id])